@@ -0,0 +1,84 @@
+"""Solve every puzzle matching the given directories or globs in parallel.
+
+Files ending in .jsonl are batch files of many puzzles, one JSON array per
+line or one after another, which are streamed rather than loaded whole.
+Results are written to stdout as one line of JSON per puzzle.
+"""
+import argparse
+import inspect
+import itertools
+import sys
+
+from lib import batch
+from lib.heuristic import HEURISTICS
+from lib.search import SOLVERS
+
+def parse_args() -> argparse.Namespace:
+    """Parse the command line."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("puzzles", nargs="+", help="directories or globs of .json puzzles or .jsonl batch files")
+    parser.add_argument("--algorithm", choices=list(SOLVERS), default="A_star")
+    parser.add_argument("--heuristic", choices=sorted(HEURISTICS))
+    parser.add_argument("--jobs", type=int, help="worker processes (default: one per core)")
+    parser.add_argument("--timeout", type=float, help="seconds allowed per puzzle")
+    parser.add_argument("--memory", type=int, help="memory limit per puzzle in MB")
+    parser.add_argument(
+        "--memory-budget", type=float, metavar="MB",
+        help="memory the A* solvers keep states in before spilling to disk",
+    )
+    parser.add_argument("--prune", action="store_true", help="skip dominated moves")
+    parser.add_argument("--cache", metavar="FILE", help="SQLite file of solutions to reuse and add to")
+    args = parser.parse_args()
+    # Refuse options the algorithm does not take instead of failing every puzzle
+    accepted = inspect.signature(SOLVERS[args.algorithm]).parameters
+    given = {
+        "heuristic": args.heuristic is not None,
+        "prune": args.prune,
+        "memory_budget": args.memory_budget is not None,
+    }
+    for option, used in given.items():
+        if used and option not in accepted:
+            parser.error(
+                f"--{option.replace('_', '-')} is not supported by {args.algorithm}"
+            )
+    return args
+
+def main() -> int:
+    args = parse_args()
+    options = {}
+    if args.heuristic is not None:
+        options["heuristic"] = args.heuristic
+    if args.prune:
+        options["prune"] = True
+    if args.memory_budget is not None:
+        options["memory_budget"] = args.memory_budget
+    paths = batch.find_puzzles(args.puzzles)
+    streams = [path for path in paths if path.endswith(".jsonl")]
+    records = itertools.chain(
+        batch.run(
+            [path for path in paths if not path.endswith(".jsonl")],
+            args.algorithm,
+            options,
+            args.jobs,
+            args.timeout,
+            args.memory,
+            args.cache,
+        ),
+        *(
+            batch.run_stream(
+                path,
+                args.algorithm,
+                options,
+                args.jobs,
+                args.timeout,
+                args.memory,
+                args.cache,
+            )
+            for path in streams
+        ),
+    )
+    unsolved = batch.write_jsonl(records, sys.stdout)
+    return 1 if unsolved else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
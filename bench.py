@@ -0,0 +1,61 @@
+"""Benchmark the solvers on the levels and compare with a baseline.
+
+Exits with a non-zero status if anything got slower than the baseline by
+more than the threshold, or expands more states than it used to, or if a
+module of the solver core takes longer than the import budget to import
+or pulls in a terminal or command line dependency.
+"""
+import argparse
+import os
+import sys
+
+from lib import batch, benchmark
+
+def parse_args() -> argparse.Namespace:
+    """Parse the command line."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("puzzles", nargs="*", default=["levels/"], help="directories or globs of .json puzzles (default: levels/)")
+    parser.add_argument("--engines", nargs="+", choices=list(benchmark.ENGINES), help="engines to run (default: all)")
+    parser.add_argument("--repeat", type=int, default=3, help="timed runs per puzzle (default: %(default)s)")
+    parser.add_argument("--warmup", type=int, default=1, help="untimed runs per puzzle (default: %(default)s)")
+    parser.add_argument("--timeout", type=float, default=10, help="seconds allowed per run (default: %(default)s)")
+    parser.add_argument("--output", default="bench_results.json", help="results file to write (default: %(default)s)")
+    parser.add_argument("--baseline", default="benchmarks/baseline.json", help="results to compare with (default: %(default)s)")
+    parser.add_argument("--threshold", type=float, default=0.2, help="allowed slowdown as a fraction (default: %(default)s)")
+    parser.add_argument("--micro-threshold", type=float, default=0.5, help="allowed slowdown of the microbenchmarks as a fraction (default: %(default)s)")
+    parser.add_argument("--import-budget", type=float, default=100, metavar="MS", help="milliseconds each core module may take to import (default: %(default)s)")
+    parser.add_argument("--save-baseline", action="store_true", help="write the results as the new baseline")
+    return parser.parse_args()
+
+def main() -> int:
+    args = parse_args()
+    paths = batch.find_puzzles(args.puzzles)
+    results = benchmark.run(paths, args.engines, args.repeat, args.warmup, args.timeout)
+    benchmark.save(results, args.output)
+    for engine, levels in results["engines"].items():
+        solved = [name for name, level in levels.items() if not level.get("timeout")]
+        print(
+            f"{engine}: {len(solved)}/{len(levels)} solved in "
+            f"{benchmark.total_time(levels, solved):.3f}s"
+        )
+    for module, result in results["imports"].items():
+        print(f"{module}: imported in {result['time'] * 1e3:.1f}ms")
+    over_budget = benchmark.check_imports(results["imports"], args.import_budget / 1e3)
+    for problem in over_budget:
+        print("OVER BUDGET", problem)
+    if args.save_baseline:
+        benchmark.save(results, args.baseline)
+        print("Saved baseline to", args.baseline)
+        return 1 if over_budget else 0
+    if not os.path.exists(args.baseline):
+        print("No baseline at", args.baseline)
+        return 1 if over_budget else 0
+    regressions = benchmark.compare(
+        results, benchmark.load(args.baseline), args.threshold, args.micro_threshold
+    )
+    for regression in regressions:
+        print("REGRESSION", regression)
+    return 1 if regressions or over_budget else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,44 @@
+"""Build the pattern databases of the pattern_database heuristic.
+
+The shapes of the databases needed are taken from the given puzzles and
+each one missing from the output directory is built.
+"""
+import argparse
+import pathlib
+import sys
+import time
+
+from lib import batch, file2collection, pattern
+from lib.packed import PackedPuzzle
+
+def parse_args() -> argparse.Namespace:
+    """Parse the command line."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("puzzles", nargs="*", default=["levels/"], help="directories or globs of .json puzzles (default: levels/)")
+    parser.add_argument("--output", default=str(pattern.PATTERN_DIR), help="directory to write to (default: %(default)s)")
+    parser.add_argument("--force", action="store_true", help="rebuild databases that already exist")
+    return parser.parse_args()
+
+def main() -> int:
+    args = parse_args()
+    shapes = set()
+    for path in batch.find_puzzles(args.puzzles):
+        puzzle, _ = PackedPuzzle.from_collection(file2collection.load(path))
+        shapes |= pattern.shapes(puzzle)
+    output = pathlib.Path(args.output)
+    output.mkdir(parents=True, exist_ok=True)
+    for shape in sorted(shapes):
+        path = output / pattern.file_name(*shape)
+        if path.exists() and not args.force:
+            continue
+        start_time = time.perf_counter()
+        distances = pattern.build(*shape)
+        pattern.save(str(path), shape, distances)
+        print(
+            f"Built {path}: {len(distances)} states in "
+            f"{time.perf_counter() - start_time:.1f}s"
+        )
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
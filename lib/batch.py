@@ -0,0 +1,245 @@
+"""Solve many puzzle files in parallel without any interaction."""
+import contextlib
+import glob
+import itertools
+import json
+import multiprocessing
+import os
+import pathlib
+import signal
+import sqlite3
+import sys
+import time
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, TextIO, Tuple
+
+from lib import file2collection, stream2puzzles
+from lib.cache import SolutionCache
+from lib.collection import BottleCollection
+from lib.search import State, solve
+from lib.stats import SearchStats
+from lib.stream2puzzles import ColourTable, EncodedPuzzle
+from lib.validate import check, check_data
+
+try:
+    import resource
+except ImportError:  # Not available on Windows
+    resource = None  # type: ignore
+
+# (path, algorithm, options, timeout in seconds, memory limit in MB,
+# solution cache file)
+Task = Tuple[
+    str, str, Dict[str, Any], Optional[float], Optional[int], Optional[str]
+]
+# (path of the stream, colour names of its `ColourTable`, puzzle,
+# algorithm, options, timeout in seconds, solution cache file)
+StreamTask = Tuple[
+    str, Tuple[str, ...], EncodedPuzzle, str, Dict[str, Any],
+    Optional[float], Optional[str],
+]
+
+# Streamed puzzles handed to the workers per job before waiting for them,
+# which bounds the memory used by a stream of any length
+STREAM_WINDOW = 64
+
+def find_puzzles(patterns: Sequence[str]) -> List[str]:
+    """Expand directories and glob `patterns` into a sorted list of files."""
+    paths: List[str] = []
+    for pattern in patterns:
+        if pathlib.Path(pattern).is_dir():
+            paths.extend(str(path) for path in pathlib.Path(pattern).glob("*.json"))
+        else:
+            paths.extend(glob.glob(pattern))
+    return sorted(set(paths))
+
+def default_jobs() -> int:
+    """Get the number of cores this process may run on."""
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+class PuzzleTimeout(Exception):
+    """Raised in a worker when a puzzle takes longer than its timeout."""
+
+def _alarm(signum: int, frame: Any) -> None:
+    """Signal handler used to stop a puzzle at its timeout."""
+    raise PuzzleTimeout()
+
+@contextlib.contextmanager
+def time_limit(seconds: Optional[float]) -> Iterator[None]:
+    """Raise `PuzzleTimeout` if the body takes longer than `seconds`.
+    This relies on SIGALRM so has no effect where it is not available.
+    """
+    if seconds is None or not hasattr(signal, "setitimer"):
+        yield
+        return
+    previous = signal.signal(signal.SIGALRM, _alarm)
+    signal.setitimer(signal.ITIMER_REAL, seconds)
+    try:
+        yield
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, previous)
+
+def solve_file(task: Task) -> Dict[str, Any]:
+    """Solve a single puzzle file and describe the outcome as a dict.
+
+    This is run in a fresh worker process for each puzzle so the memory
+    limit and the peak memory use only apply to that puzzle.
+    """
+    path, algorithm, options, timeout, memory, cache_path = task
+    record: Dict[str, Any] = {"puzzle": path, "algorithm": algorithm}
+    _limit_memory(memory)
+    _solve(
+        record, lambda: file2collection.load(path),
+        algorithm, options, timeout, cache_path,
+    )
+    if resource is not None:
+        # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+        scale = 1 if sys.platform == "darwin" else 1024
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale
+        record["peak_rss_mb"] = peak / (1024 * 1024)
+    return record
+
+def solve_encoded(task: StreamTask) -> Dict[str, Any]:
+    """Solve a puzzle of a stream and describe the outcome as a dict.
+    Workers solve many streamed puzzles, so no peak memory is reported.
+    """
+    path, colours, encoded, algorithm, options, timeout, cache_path = task
+    record: Dict[str, Any] = {
+        "puzzle": path, "index": encoded.index, "algorithm": algorithm,
+    }
+
+    def load() -> BottleCollection:
+        """Unpack the puzzle and check it can be solved."""
+        if encoded.raw is not None:
+            # Raises the error that kept the puzzle from being encoded
+            if not isinstance(encoded.raw, list):
+                raise ValueError("A puzzle must be a list of bottles")
+            check_data(encoded.raw, encoded.capacity)
+            root = BottleCollection(encoded.raw)
+        else:
+            puzzle, state = ColourTable(colours).puzzle(encoded)
+            root = puzzle.unpack(state)
+        check(root)
+        return root
+
+    return _solve(record, load, algorithm, options, timeout, cache_path)
+
+def _limit_memory(memory: Optional[int]) -> None:
+    """Limit the memory of this process to `memory` MB if given."""
+    if memory is not None and resource is not None:
+        limit = memory * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+
+def _solve(
+    record: Dict[str, Any],
+    load: Callable[[], BottleCollection],
+    algorithm: str,
+    options: Dict[str, Any],
+    timeout: Optional[float],
+    cache_path: Optional[str],
+) -> Dict[str, Any]:
+    """Solve the puzzle `load` gets and add the outcome to `record`."""
+    stats = SearchStats()
+    result: Optional[State] = None
+    start_time = time.perf_counter()
+    try:
+        with time_limit(timeout):
+            root = load()
+            if cache_path is None:
+                result = solve(root, algorithm, stats=stats, **options)
+            else:
+                cache = SolutionCache(cache_path)
+                try:
+                    result = cache.solve(root, algorithm, stats=stats, **options)
+                finally:
+                    cache.close()
+    except PuzzleTimeout:
+        record["error"] = "timeout"
+    except MemoryError:
+        record["error"] = "memory"
+    except (OSError, ValueError, KeyError, TypeError, sqlite3.Error) as err:
+        record["error"] = f"{err.__class__.__name__}: {err}"
+    record["time"] = time.perf_counter() - start_time
+    record["solved"] = result is not None
+    if result is not None:
+        record["moves"] = [[move.src, move.dest] for move in result.moves]
+        record["length"] = len(result.moves)
+    record["nodes_expanded"] = stats.nodes_expanded
+    record["stats"] = stats.as_dict()
+    return record
+
+def run(
+    paths: Sequence[str],
+    algorithm: str = "A_star",
+    options: Optional[Dict[str, Any]] = None,
+    jobs: Optional[int] = None,
+    timeout: Optional[float] = None,
+    memory: Optional[int] = None,
+    cache: Optional[str] = None,
+) -> Iterator[Dict[str, Any]]:
+    """Solve every puzzle in `paths` on a pool of `jobs` processes.
+    Results are yielded in the order the puzzles finish. Solutions are
+    looked up in and added to the `SolutionCache` file `cache` if given.
+    """
+    tasks: List[Task] = [
+        (path, algorithm, options or {}, timeout, memory, cache)
+        for path in paths
+    ]
+    with multiprocessing.Pool(jobs or default_jobs(), maxtasksperchild=1) as pool:
+        yield from pool.imap_unordered(solve_file, tasks)
+
+def run_stream(
+    path: str,
+    algorithm: str = "A_star",
+    options: Optional[Dict[str, Any]] = None,
+    jobs: Optional[int] = None,
+    timeout: Optional[float] = None,
+    memory: Optional[int] = None,
+    cache: Optional[str] = None,
+) -> Iterator[Dict[str, Any]]:
+    """Solve every puzzle of the batch file `path`, see `stream2puzzles`.
+    The file is read as the workers need puzzles, at most `STREAM_WINDOW`
+    per job ahead of them, so it can hold any number of puzzles. Each
+    worker solves many puzzles and `memory` limits the whole worker.
+    Puzzles that are not valid give error records, invalid JSON gives one
+    and ends the stream.
+    """
+    jobs = jobs or default_jobs()
+    table = ColourTable()
+    with open(path) as fh, multiprocessing.Pool(
+        jobs, initializer=_limit_memory, initargs=(memory,)
+    ) as pool:
+        puzzles = stream2puzzles.load(fh, table)
+        error: Optional[str] = None
+        read = 0
+        while error is None:
+            window: List[EncodedPuzzle] = []
+            try:
+                window.extend(itertools.islice(puzzles, STREAM_WINDOW * jobs))
+            except ValueError as err:
+                # Invalid JSON, the puzzles after it cannot be told apart
+                error = f"{err.__class__.__name__}: {err}"
+            if not window and error is None:
+                return
+            read += len(window)
+            colours = tuple(table.names)
+            tasks: List[StreamTask] = [
+                (path, colours, encoded, algorithm, options or {}, timeout, cache)
+                for encoded in window
+            ]
+            yield from pool.imap_unordered(solve_encoded, tasks)
+        yield {
+            "puzzle": path, "index": read, "algorithm": algorithm,
+            "error": error, "solved": False,
+        }
+
+def write_jsonl(records: Iterator[Dict[str, Any]], out: TextIO) -> int:
+    """Write each record as a line of JSON, returning the number unsolved."""
+    unsolved = 0
+    for record in records:
+        if not record["solved"]:
+            unsolved += 1
+        out.write(json.dumps(record) + "\n")
+        out.flush()
+    return unsolved
@@ -0,0 +1,186 @@
+"""Expansion of whole blocks of packed states at once with NumPy.
+
+A block is a uint8 array of shape (states, bottles, capacity) holding
+packed states as laid out by `PackedPuzzle`. The properties of every
+bottle, the valid moves, the children and their heuristic are computed
+for the whole block with array operations instead of a Python loop per
+state, which pays off on wide frontiers. NumPy is optional: `lib.search`
+only imports this module when a batched solver is used.
+"""
+from __future__ import annotations
+
+from typing import Any, List, Optional, Set, Tuple
+
+from lib.collection import BottleCollection
+from lib.packed import PackedPuzzle
+from lib.paths import ROOT, PathTree
+from lib.search import State
+from lib.stats import SearchStats
+
+try:
+    import numpy as np
+except ImportError:  # Only needed by the batched solvers
+    np = None
+
+# (lengths, heads, runs, unique) of every bottle of a block, each an array
+# of shape (states, bottles)
+BlockInfo = Tuple[Any, Any, Any, Any]
+
+def _require_numpy() -> None:
+    """Fail with a clear message if NumPy is not installed."""
+    if np is None:
+        raise ImportError("The batched solvers need NumPy, install it with pip")
+
+def to_block(puzzle: PackedPuzzle, states: List[bytes]) -> Any:
+    """Stack packed `states` into a block."""
+    data = np.frombuffer(b"".join(states), dtype=np.uint8)
+    return data.reshape(len(states), puzzle.num_bottles, puzzle.capacity)
+
+def block_info(block: Any) -> BlockInfo:
+    """Get the length, head colour, number of items matching the head and
+    whether it holds a single colour for every bottle of `block`.
+    """
+    cap = block.shape[2]
+    lengths = np.count_nonzero(block, axis=2)
+    tops = np.take_along_axis(block, np.maximum(lengths - 1, 0)[..., None], 2)
+    heads = tops[..., 0]
+    # The run of the head ends below the highest item of another colour
+    positions = np.arange(cap)
+    mismatch = (block != heads[..., None]) & (positions < lengths[..., None])
+    last_mismatch = np.where(mismatch, positions, -1).max(axis=2)
+    runs = lengths - 1 - last_mismatch
+    runs[lengths == 0] = 0
+    return lengths, heads, runs, runs == lengths
+
+def _move_mask(block: Any, info: BlockInfo) -> Any:
+    """Get whether each bottle can be poured into each other bottle, for
+    every state of `block`, as an array of shape (states, bottles, bottles).
+    """
+    num_bottles, cap = block.shape[1:]
+    lengths, heads, runs, unique = info
+    src_ok = (lengths > 0) & ~(unique & ((lengths == cap) | (lengths > 2)))
+    fits = runs[:, :, None] <= cap - lengths[:, None, :]
+    matching = (lengths[:, None, :] > 0) & (heads[:, None, :] == heads[:, :, None])
+    # Only the first empty bottle is poured into, and never a single colour
+    empty = lengths == 0
+    first_empty = np.zeros_like(empty)
+    has_empty = empty.any(axis=1)
+    first_empty[has_empty, empty[has_empty].argmax(axis=1)] = True
+    into_empty = first_empty[:, None, :] & ~unique[:, :, None]
+    mask = src_ok[:, :, None] & fits & (matching | into_empty)
+    mask &= ~np.eye(num_bottles, dtype=bool)
+    return mask
+
+def valid_moves(block: Any, info: BlockInfo) -> Tuple[Any, Any, Any]:
+    """Get the (state, src, dest) index arrays of the moves of every state
+    of `block`, in the order of `PackedPuzzle.get_moves`.
+    """
+    return np.nonzero(_move_mask(block, info))
+
+def is_dead_end(block: Any, info: BlockInfo) -> Any:
+    """Check which states of `block` are `PackedPuzzle.is_dead_end`."""
+    has_moves = _move_mask(block, info).any(axis=(1, 2))
+    return ~has_moves & ~is_solved(block, info)
+
+def apply_moves(
+    block: Any, info: BlockInfo, parents: Any, srcs: Any, dests: Any
+) -> Any:
+    """Get the block of the children made by pouring `srcs` into `dests`
+    in the states `parents` of `block`. The moves must be valid.
+    """
+    lengths, heads, runs, _ = info
+    children = block[parents].copy()
+    rows = np.arange(len(parents))
+    src_lengths = lengths[parents, srcs]
+    dest_lengths = lengths[parents, dests]
+    amounts = runs[parents, srcs]
+    colours = heads[parents, srcs]
+    # Valid moves pour the whole run, one slot of every move at a time
+    for k in range(block.shape[2]):
+        moving = k < amounts
+        children[rows[moving], dests[moving], dest_lengths[moving] + k] = colours[moving]
+        children[rows[moving], srcs[moving], src_lengths[moving] - 1 - k] = 0
+    return children
+
+def is_solved(block: Any, info: BlockInfo) -> Any:
+    """Check which states of `block` are solved."""
+    lengths, _, _, unique = info
+    return ((lengths == 0) | (unique & (lengths == block.shape[2]))).all(axis=1)
+
+def bottom_colours(block: Any) -> Any:
+    """Get the `bottom_colours` heuristic of every state of `block`."""
+    breaks = np.count_nonzero(
+        (block[:, :, 1:] != block[:, :, :-1]) & (block[:, :, 1:] != 0), axis=(1, 2)
+    )
+    bottoms = np.sort(block[:, :, 0], axis=1)
+    distinct = (bottoms[:, 0] != 0) + np.count_nonzero(
+        (bottoms[:, 1:] != bottoms[:, :-1]) & (bottoms[:, 1:] != 0), axis=1
+    )
+    return breaks + np.count_nonzero(bottoms, axis=1) - distinct
+
+def keys(block: Any) -> Any:
+    """Get the `PackedPuzzle.key` of every state of `block`, without colour
+    symmetry, as a row of bytes per state.
+    """
+    _, num_bottles, cap = block.shape
+    bottles = np.ascontiguousarray(block).view(f"V{cap}")[..., 0]
+    return np.sort(bottles, axis=1).view(f"V{num_bottles * cap}")[:, 0]
+
+def batched_beam_search(
+    root: BottleCollection,
+    width: int = 100,
+    stats: Optional[SearchStats] = None,
+) -> Optional[State]:
+    """Perform `beam_search` with the bottom_colours heuristic, expanding
+    every depth as one block.
+
+    The solutions are the same as `beam_search`, which is faster on narrow
+    beams as it does not pay the overhead of the array operations.
+    """
+    _require_numpy()
+    if stats is None:
+        stats = SearchStats()
+    stats.start()
+    puzzle, start = PackedPuzzle.from_collection(root)
+    block = to_block(puzzle, [start])
+    seen: Set[bytes] = {puzzle.key(start)}
+    paths = PathTree(puzzle.num_bottles)
+    # Nodes in `paths` of the states of `block`
+    nodes = np.array([ROOT])
+    depth = 0
+    result: Optional[State] = None
+    while len(block):
+        info = block_info(block)
+        solved = np.flatnonzero(is_solved(block, info))
+        if len(solved):
+            state = block[solved[0]].tobytes()
+            result = State(puzzle.unpack(state), paths.moves(int(nodes[solved[0]])), depth)
+            break
+        parents, srcs, dests = valid_moves(block, info)
+        stats.expand(depth, len(block), len(parents), len(block))
+        children = apply_moves(block, info, parents, srcs, dests)
+        # Drop the dead ends, then keep the first of the children sharing
+        # a key, in the order `beam_search` generates them, and drop those
+        # seen before
+        alive = np.flatnonzero(~is_dead_end(children, block_info(children)))
+        stats.dead_ends += len(children) - len(alive)
+        child_keys = keys(children)
+        _, first = np.unique(child_keys[alive], return_index=True)
+        first = alive[np.sort(first)]
+        new = [i for i in first.tolist() if child_keys[i].tobytes() not in seen]
+        stats.duplicates += len(alive) - len(new)
+        seen.update(child_keys[i].tobytes() for i in new)
+        new = np.array(new, dtype=np.intp)
+        scores = bottom_colours(children[new])
+        kept = new[np.argsort(scores, kind="stable")[:width]]
+        kept_scores = np.sort(scores, kind="stable")[:width]
+        nodes = np.array([
+            paths.add(int(nodes[parent]), int(src), int(dest), int(score) + depth + 1)
+            for parent, src, dest, score in zip(
+                parents[kept], srcs[kept], dests[kept], kept_scores
+            )
+        ], dtype=np.intp)
+        block = children[kept]
+        depth += 1
+    stats.stop()
+    return result
@@ -0,0 +1,349 @@
+"""Reproducible benchmarks of the solvers and their hot paths."""
+import datetime
+import gc
+import importlib.util
+import json
+import pathlib
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from lib import file2collection
+from lib.batch import PuzzleTimeout, time_limit
+from lib.collection import BottleCollection
+from lib.packed import PackedPuzzle
+from lib.search import solve
+from lib.stats import SearchStats
+
+# Bumped whenever the layout of the results file changes
+RESULTS_VERSION = 1
+
+# Slowdowns of an engine's total time below this many seconds are noise
+NOISE_FLOOR = 0.05
+
+# Benchmarked engines: name -> (algorithm, options)
+ENGINES: Dict[str, Tuple[str, Dict[str, Any]]] = {
+    "dfs": ("dfs", {}),
+    "dfs_pruned": ("dfs", {"prune": True}),
+    "A_star": ("A_star", {}),
+    "A_star_lookahead": ("A_star", {"heuristic": "lookahead"}),
+    "A_star_pruned": ("A_star", {"prune": True}),
+    "A_star_pattern": ("A_star", {"heuristic": "pattern_database"}),
+    "weighted_A_star": ("weighted_A_star", {}),
+    "anytime_A_star": ("anytime_A_star", {}),
+    "ida_star": ("ida_star", {"heuristic": "lookahead"}),
+    "beam_search": ("beam_search", {}),
+    "bidirectional": ("bidirectional", {}),
+}
+# The batched engine needs the optional NumPy
+if importlib.util.find_spec("numpy") is not None:
+    ENGINES["batched_beam_search"] = ("batched_beam_search", {})
+
+# Modules of the solver core, which short lived solver runs import
+CORE_MODULES = (
+    "lib.collection", "lib.bottle", "lib.search",
+    "lib.json2collection", "lib.file2collection",
+)
+# Modules only needed to print puzzles or run the command line, which the
+# core must leave to be imported when they are used
+FRONTEND_MODULES = ("sty", "click", "psutil")
+
+def bench_solver(
+    root: BottleCollection,
+    algorithm: str,
+    options: Dict[str, Any],
+    repeat: int = 3,
+    warmup: int = 1,
+    timeout: Optional[float] = None,
+) -> Dict[str, Any]:
+    """Time solving `root` `repeat` times after `warmup` untimed runs.
+
+    The fastest and mean times are reported with the nodes expanded and
+    solution length of the last run. One more run measures the peak memory
+    allocated with tracemalloc, which is too slow to leave on while timing.
+    """
+    times: List[float] = []
+    try:
+        for run in range(warmup + repeat):
+            stats = SearchStats()
+            gc.collect()
+            start = time.perf_counter()
+            with time_limit(timeout):
+                result = solve(root, algorithm, stats=stats, **options)
+            if run >= warmup:
+                times.append(time.perf_counter() - start)
+        tracemalloc.start()
+        try:
+            with time_limit(timeout):
+                solve(root, algorithm, **options)
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+    except PuzzleTimeout:
+        return {"timeout": True}
+    return {
+        "time_min": min(times),
+        "time_mean": sum(times) / len(times),
+        "nodes_expanded": stats.nodes_expanded,
+        "length": None if result is None else len(result.moves),
+        "peak_memory": peak,
+    }
+
+def micro_benchmarks(
+    root: BottleCollection, number: int = 1000, repeat: int = 15
+) -> Dict[str, float]:
+    """Get the seconds per call of the hot paths of the search on `root`.
+
+    Each case is timed `repeat` times over `number` calls and the fastest
+    is kept. Functions that cache or mutate get a fresh copy of their
+    input for every call, made before the timer starts.
+    """
+    move = root.get_moves()[0]
+    src, dest = move.src, move.dest
+    puzzle, state = PackedPuzzle.from_collection(root)
+    # name -> (make the input of one call, the call)
+    cases: Dict[str, Tuple[Callable[[], Any], Callable[[Any], Any]]] = {
+        "BottleCollection.get_moves": (root.copy, BottleCollection.get_moves),
+        "BottleCollection.after_moving": (
+            lambda: root, lambda collection: collection.after_moving(move)
+        ),
+        "BottleCollection.minRequiredMoves": (
+            lambda: root, BottleCollection.minRequiredMoves
+        ),
+        "Bottle.pour": (
+            lambda: (root[src].copy(), root[dest].copy()),
+            lambda bottles: bottles[0].pour(bottles[1]),
+        ),
+        "PackedPuzzle.get_moves": (lambda: state, puzzle.get_moves),
+        "PackedPuzzle.after_moving": (
+            lambda: state, lambda state: puzzle.after_moving(state, src, dest)
+        ),
+        "PackedPuzzle.min_required_moves": (lambda: state, puzzle.min_required_moves),
+        "PackedPuzzle.key": (lambda: state, puzzle.key),
+    }
+    results: Dict[str, float] = {}
+    for name, (make, call) in cases.items():
+        best = None
+        for _ in range(repeat):
+            inputs = [make() for _ in range(number)]
+            start = time.perf_counter()
+            for value in inputs:
+                call(value)
+            seconds = (time.perf_counter() - start) / number
+            best = seconds if best is None else min(best, seconds)
+        results[name] = best
+    return results
+
+def import_times(
+    modules: Sequence[str] = CORE_MODULES, repeat: int = 5
+) -> Dict[str, Dict[str, Any]]:
+    """Time importing each of `modules` in a fresh interpreter.
+
+    The fastest of `repeat` cumulative times reported by `-X importtime`
+    is kept with the `FRONTEND_MODULES` the import loaded.
+    """
+    root = pathlib.Path(__file__).resolve().parent.parent
+    results: Dict[str, Dict[str, Any]] = {}
+    for module in modules:
+        code = (
+            f"import sys, {module}\n"
+            f"print(*[name for name in {FRONTEND_MODULES!r} if name in sys.modules])"
+        )
+        best = None
+        for _ in range(repeat):
+            run = subprocess.run(
+                [sys.executable, "-X", "importtime", "-c", code],
+                capture_output=True, text=True, check=True, cwd=root,
+            )
+            # Lines are "import time: self [us] | cumulative | name"
+            for line in run.stderr.splitlines():
+                parts = line.split("|")
+                if len(parts) == 3 and parts[2].strip() == module:
+                    seconds = int(parts[1]) / 1e6
+                    best = seconds if best is None else min(best, seconds)
+        results[module] = {"time": best, "loads": run.stdout.split()}
+    return results
+
+def check_imports(imports: Dict[str, Dict[str, Any]], budget: float) -> List[str]:
+    """Describe every module of `import_times` that took more than
+    `budget` seconds to import or loaded one of `FRONTEND_MODULES`.
+    """
+    problems: List[str] = []
+    for module, result in imports.items():
+        if result["time"] is not None and result["time"] > budget:
+            problems.append(
+                f"{module}: imports in {result['time'] * 1e3:.1f}ms, "
+                f"budget {budget * 1e3:.1f}ms"
+            )
+        for name in result["loads"]:
+            problems.append(f"{module}: imports {name}")
+    return problems
+
+def micro_in_processes(path: str, processes: int = 3) -> Dict[str, float]:
+    """Run `micro_benchmarks` on the puzzle at `path` in `processes` fresh
+    interpreters and keep the fastest time of each case.
+    Times of these microsecond calls differ a lot between processes, e.g.
+    with the hash seed, but little within one, so repeating them in one
+    process is not enough.
+    """
+    root = pathlib.Path(__file__).resolve().parent.parent
+    code = (
+        "import json, sys\n"
+        "from lib import benchmark, file2collection\n"
+        "print(json.dumps(benchmark.micro_benchmarks(file2collection.load(sys.argv[1]))))"
+    )
+    results: Dict[str, float] = {}
+    for _ in range(processes):
+        run = subprocess.run(
+            [sys.executable, "-c", code, str(pathlib.Path(path).resolve())],
+            capture_output=True, text=True, check=True, cwd=root,
+        )
+        for name, seconds in json.loads(run.stdout).items():
+            results[name] = min(seconds, results.get(name, seconds))
+    return results
+
+def calibrate(repeat: int = 5) -> float:
+    """Time a fixed pure Python workload, the fastest of `repeat` runs.
+    Comparing it between runs tells how much faster the machine is.
+    """
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        table: Dict[bytes, int] = {}
+        for i in range(200000):
+            key = i.to_bytes(4, "little")
+            table[key] = table.get(key[:2], 0) + len(key)
+        seconds = time.perf_counter() - start
+        best = seconds if best is None else min(best, seconds)
+    return best
+
+def _commit() -> Optional[str]:
+    """Get the commit being benchmarked if run from a git checkout."""
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def run(
+    paths: Sequence[str],
+    engines: Optional[Sequence[str]] = None,
+    repeat: int = 3,
+    warmup: int = 1,
+    timeout: Optional[float] = None,
+    micro_puzzle: Optional[str] = None,
+) -> Dict[str, Any]:
+    """Benchmark `engines` on each puzzle in `paths`.
+    Microbenchmarks are run on `micro_puzzle`, or the one in `paths` with
+    the most bottles.
+    """
+    puzzles = {pathlib.Path(path).stem: file2collection.load(path) for path in paths}
+    results: Dict[str, Any] = {
+        "version": RESULTS_VERSION,
+        "commit": _commit(),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "created": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        "engines": {},
+        "micro": {},
+        "imports": import_times(),
+        "calibration": calibrate(),
+    }
+    for engine in engines or ENGINES:
+        algorithm, options = ENGINES[engine]
+        results["engines"][engine] = {
+            name: bench_solver(root, algorithm, options, repeat, warmup, timeout)
+            for name, root in puzzles.items()
+        }
+    if micro_puzzle is None and paths:
+        micro_puzzle = max(paths, key=lambda path: len(puzzles[pathlib.Path(path).stem]))
+    if micro_puzzle is not None:
+        results["micro"] = micro_in_processes(micro_puzzle)
+    # The machine may have slowed down or sped up while running
+    results["calibration"] = min(results["calibration"], calibrate())
+    return results
+
+def total_time(levels: Dict[str, Dict[str, Any]], names: Sequence[str]) -> float:
+    """Sum the fastest times of the levels `names`."""
+    return sum(levels[name]["time_min"] for name in names)
+
+def compare(
+    results: Dict[str, Any],
+    baseline: Dict[str, Any],
+    threshold: float = 0.2,
+    micro_threshold: float = 0.5,
+) -> List[str]:
+    """Describe every regression of `results` compared to `baseline`.
+
+    An engine regresses if its total time over the levels solved in both
+    runs grows by more than `threshold` and `NOISE_FLOOR` seconds, if it
+    expands more states on a level or if it no longer solves a level in
+    time. Microbenchmarks take microseconds and vary more between runs, so
+    they regress if they slow down by more than `micro_threshold`. Engines
+    and microbenchmarks missing from the baseline are reported too, as
+    they cannot be checked until the baseline is saved again. Times of
+    the baseline are first scaled by how much slower the machine ran the
+    `calibrate` workload.
+    """
+    if baseline.get("version") != results.get("version"):
+        return [f"baseline version {baseline.get('version')} cannot be compared"]
+    regressions: List[str] = []
+    scale = 1.0
+    if baseline.get("calibration") and results.get("calibration"):
+        scale = results["calibration"] / baseline["calibration"]
+    for engine, levels in results["engines"].items():
+        old_levels = baseline["engines"].get(engine)
+        if old_levels is None:
+            regressions.append(f"{engine}: not in the baseline")
+            continue
+        common: List[str] = []
+        for name, result in levels.items():
+            old = old_levels.get(name)
+            if old is None or old.get("timeout"):
+                continue
+            if result.get("timeout"):
+                regressions.append(f"{engine} {name}: now times out")
+                continue
+            common.append(name)
+            if result["nodes_expanded"] > old["nodes_expanded"]:
+                regressions.append(
+                    f"{engine} {name}: expands {result['nodes_expanded']} "
+                    f"states, was {old['nodes_expanded']}"
+                )
+        new_time = total_time(levels, common)
+        old_time = total_time(old_levels, common) * scale
+        if (
+            common
+            and new_time > old_time * (1 + threshold)
+            and new_time - old_time > NOISE_FLOOR
+        ):
+            regressions.append(
+                f"{engine}: {new_time:.3f}s, was {old_time:.3f}s"
+            )
+    for name, seconds in results["micro"].items():
+        old_seconds = baseline["micro"].get(name)
+        if old_seconds is not None:
+            old_seconds *= scale
+        if old_seconds is None:
+            regressions.append(f"{name}: not in the baseline")
+        elif seconds > old_seconds * (1 + micro_threshold):
+            regressions.append(
+                f"{name}: {seconds * 1e6:.2f}us, was {old_seconds * 1e6:.2f}us"
+            )
+    return regressions
+
+def load(path: str) -> Dict[str, Any]:
+    """Load a results file."""
+    with open(path) as fh:
+        return json.load(fh)
+
+def save(results: Dict[str, Any], path: str) -> None:
+    """Save a results file."""
+    with open(path, "w") as fh:
+        json.dump(results, fh, indent=2)
+        fh.write("\n")
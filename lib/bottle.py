@@ -42,22 +42,7 @@ class Bottle:
                 )
 
         # Setup the number of matching items at the head of the bottle
-        data_len = len(self.__data)
-        if data_len != 0:
-            self.__num_matching_head = 1
-        else:
-            self.__num_matching_head = 0
-
-        # if there is more than one item, loop backward through the items
-        # counting how many match the head item, break the loop at the
-        # first non-matching item.
-        if data_len > 1:
-            head = self.__data[-1]
-            for item in reversed(self.__data[:-1]):
-                if item == head:
-                    self.__num_matching_head += 1
-                else:
-                    break
+        self.__num_matching_head = self.__count_matching_head(self.__data, 0)
 
     @property
     def data(self) -> Tuple[Item, ...]:
@@ -88,9 +73,7 @@ class Bottle:
         """Check if the bottle has a unique collection of items.
         Returns true if empty or all contents are the same colour.
         """
-        if len(self.__data) == 0:
-            return True
-        return len(set(self.__data)) == 1
+        return self.__num_matching_head == len(self.__data)
 
     @property
     def is_solved(self) -> bool:
@@ -144,29 +127,70 @@ class Bottle:
             return False
         if not target.test_item(head):
             return False
-        # Remove the last item from data and add it to target
-        self.__data = self.__data[:-1]
-        target.add(head)
-        self.__num_matching_head -= 1
-        # Check for matching colours left at head and keep repeating
-        # until all have been moved or target is full
-        while self.head is not None and self.head == head:
-            if target.is_full:
-                break
-            self.__data = self.__data[:-1]
-            target.add(head)
-            self.__num_matching_head -= 1
-        if self.__num_matching_head == 0 and not self.is_empty:
-            # There is a new head colour and we need to re-compute the number
-            # of matching items by looping backward through the items
-            self.__num_matching_head = 1
-            for item in reversed(self.__data[:-1]):
-                if item == self.head:
-                    self.__num_matching_head += 1
-                else:
-                    break
+        amount = min(self.__num_matching_head, target.capacity - len(target))
+        target.__num_matching_head += amount
+        target.__data = target.__data + self.__data[-amount:]
+        self.__data = self.__data[:-amount]
+        self.__num_matching_head = self.__count_matching_head(
+            self.__data, self.__num_matching_head - amount
+        )
         return True
 
+    def poured_into(self, target: Bottle) -> Tuple[Bottle, Bottle]:
+        """Get new bottles for this bottle and `target` after a `pour`.
+        Neither bottle is modified so both can still be shared by other
+        collections.
+        """
+        head = self.head
+        if head is None or not target.test_item(head):
+            raise ValueError("Invalid pour", self, target)
+        amount = min(self.__num_matching_head, target.capacity - len(target))
+        source = Bottle._from_data(
+            self.__data[:-amount],
+            self.capacity,
+            self.__count_matching_head(
+                self.__data[:-amount], self.__num_matching_head - amount
+            ),
+        )
+        poured = Bottle._from_data(
+            target.__data + self.__data[-amount:],
+            target.capacity,
+            target.__num_matching_head + amount,
+        )
+        return source, poured
+
+    @classmethod
+    def _from_data(
+        cls, data: Tuple[Item, ...], capacity: int, num_matching_head: int
+    ) -> Bottle:
+        """Create a bottle from already checked `data`, skipping the
+        validation and counting done by `__init__`.
+        """
+        bottle = cls.__new__(cls)
+        bottle._capacity = capacity
+        bottle.__data = data
+        bottle.__num_matching_head = num_matching_head
+        return bottle
+
+    @staticmethod
+    def __count_matching_head(data: Tuple[Item, ...], known: int) -> int:
+        """Count the items matching the head of `data`, where `known` is how
+        many are already known to match, so counting is only needed when the
+        head changed.
+        """
+        if known > 0 or not data:
+            return known
+        # There is a new head colour and we need to re-compute the number
+        # of matching items by looping backward through the items
+        count = 1
+        head = data[-1]
+        for item in reversed(data[:-1]):
+            if item == head:
+                count += 1
+            else:
+                break
+        return count
+
     def add(self, item: Item) -> bool:
         """Add `item` to this collection.
         Returns a boolean indicating success.
@@ -0,0 +1,133 @@
+"""Persistent cache of solutions keyed by the canonical form of a puzzle."""
+import json
+import sqlite3
+import time
+from typing import Any, List, Optional, Tuple
+
+from lib.canonical import canonical_order
+from lib.collection import BottleCollection
+from lib.move import Move
+from lib.packed import PackedPuzzle
+from lib.search import State, solve
+from lib.stats import SearchStats
+
+class SolutionCache:
+    """SQLite store mapping canonical puzzles to their solutions.
+
+    Puzzles are keyed with their colours renumbered and bottles sorted, so
+    a puzzle with its bottles or colours shuffled shares the entry of the
+    original. Moves are stored between positions in the sorted order and
+    mapped back to the bottles of each puzzle looked up. Once the cache
+    holds more than `max_entries` solutions the least recently used ones
+    are removed.
+    """
+    def __init__(self, path: str = "solutions.sqlite3", max_entries: int = 100000):
+        """Open (or create) the cache stored at `path`."""
+        self.max_entries = max_entries
+        self.__db = sqlite3.connect(path, timeout=30)
+        self.__db.execute(
+            "CREATE TABLE IF NOT EXISTS solutions ("
+            " key BLOB PRIMARY KEY,"
+            " moves TEXT NOT NULL,"
+            " algorithm TEXT,"
+            " nodes_expanded INTEGER,"
+            " elapsed REAL,"
+            " last_used REAL NOT NULL)"
+        )
+        self.__db.execute(
+            "CREATE INDEX IF NOT EXISTS solutions_last_used"
+            " ON solutions (last_used)"
+        )
+        self.__db.commit()
+
+    @staticmethod
+    def _key(root: BottleCollection) -> Tuple[bytes, List[int]]:
+        """Get the canonical key of `root` and the order of its bottles."""
+        puzzle, state = PackedPuzzle.from_collection(root)
+        key, order = canonical_order(puzzle.bottles(state), True)
+        return bytes([puzzle.capacity]) + key, order
+
+    def get(self, root: BottleCollection) -> Optional[State]:
+        """Get the cached solution of `root`, or None if there is none."""
+        key, order = self._key(root)
+        row = self.__db.execute(
+            "SELECT moves FROM solutions WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return None
+        collection = root
+        moves: List[Move] = []
+        try:
+            for src, dest in json.loads(row[0]):
+                moves.append(Move(order[src], order[dest]))
+                collection = collection.after_moving(moves[-1])
+        except (ValueError, IndexError):
+            collection = root
+        if not collection.is_solved:
+            # Drop entries that do not solve the puzzle they are keyed by
+            self.__db.execute("DELETE FROM solutions WHERE key = ?", (key,))
+            self.__db.commit()
+            return None
+        self.__db.execute(
+            "UPDATE solutions SET last_used = ? WHERE key = ?", (time.time(), key)
+        )
+        self.__db.commit()
+        return State(collection, tuple(moves))
+
+    def put(
+        self,
+        root: BottleCollection,
+        result: State,
+        algorithm: Optional[str] = None,
+        stats: Optional[SearchStats] = None,
+    ) -> None:
+        """Store `result` as the solution of `root`."""
+        key, order = self._key(root)
+        position = {bottle: i for i, bottle in enumerate(order)}
+        moves = [[position[move.src], position[move.dest]] for move in result.moves]
+        self.__db.execute(
+            "INSERT OR REPLACE INTO solutions VALUES (?, ?, ?, ?, ?, ?)",
+            (
+                key,
+                json.dumps(moves),
+                algorithm,
+                None if stats is None else stats.nodes_expanded,
+                None if stats is None else stats.elapsed,
+                time.time(),
+            ),
+        )
+        self.__db.execute(
+            "DELETE FROM solutions WHERE key IN (SELECT key FROM solutions"
+            " ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,),
+        )
+        self.__db.commit()
+
+    def solve(
+        self,
+        root: BottleCollection,
+        algorithm: str,
+        stats: Optional[SearchStats] = None,
+        **options: Any,
+    ) -> Optional[State]:
+        """Look up the solution of `root` and only search for it if missing.
+        Solutions found by searching are added to the cache.
+        """
+        result = self.get(root)
+        if result is not None:
+            return result
+        if stats is None:
+            stats = SearchStats()
+        result = solve(root, algorithm, stats=stats, **options)
+        if result is not None:
+            self.put(root, result, algorithm, stats)
+        return result
+
+    def __len__(self) -> int:
+        """Get the number of solutions in the cache."""
+        (count,) = self.__db.execute("SELECT COUNT(*) FROM solutions").fetchone()
+        return count
+
+    def close(self) -> None:
+        """Close the underlying database."""
+        self.__db.close()
@@ -0,0 +1,67 @@
+"""Canonical forms of packed states used to detect duplicate states."""
+from typing import Dict, List, Sequence, Tuple
+
+def canonical_key(bottles: Sequence[bytes], colour_symmetry: bool = False) -> bytes:
+    """Get a key for the packed `bottles` that ignores their order.
+
+    The key is the sorted multiset of the bottles, so repeated bottles are
+    kept. With `colour_symmetry` the colours are first renumbered by how
+    they are placed in the bottles, so states that only differ by swapping
+    colours usually share a key. Colours that cannot be told apart this way
+    keep their relative order: some symmetric states may then get different
+    keys, but states that are not symmetric never share one.
+    """
+    if colour_symmetry:
+        bottles = relabel(bottles)
+    return b"".join(sorted(bottles))
+
+def canonical_order(
+    bottles: Sequence[bytes], colour_symmetry: bool = False
+) -> Tuple[bytes, List[int]]:
+    """Get the `canonical_key` of `bottles` and the order used to build it.
+    `order[i]` is the index in `bottles` of the i-th bottle in the key.
+    """
+    if colour_symmetry:
+        bottles = relabel(bottles)
+    order = sorted(range(len(bottles)), key=bottles.__getitem__)
+    return b"".join(bottles[i] for i in order), order
+
+def relabel(bottles: Sequence[bytes]) -> List[bytes]:
+    """Renumber the colours in `bottles` independently of their codes.
+
+    Colours are split into classes by where they sit in the bottles, then
+    the classes are refined by the classes of the colours above and below
+    them until they stop changing.
+    """
+    places: Dict[int, List[Tuple[int, int, int, int]]] = {}
+    for bottle in bottles:
+        length = len(bottle.rstrip(b"\x00"))
+        for position in range(length):
+            below = bottle[position - 1] if position > 0 else 0
+            above = bottle[position + 1] if position + 1 < length else 0
+            places.setdefault(bottle[position], []).append(
+                (position, length, below, above)
+            )
+    classes: Dict[int, int] = {colour: 0 for colour in places}
+    classes[0] = -1
+    num_classes = 1
+    while True:
+        signatures = {
+            colour: (classes[colour], tuple(sorted(
+                (position, length, classes[below], classes[above])
+                for position, length, below, above in places[colour]
+            )))
+            for colour in places
+        }
+        ranks = {
+            signature: rank
+            for rank, signature in enumerate(sorted(set(signatures.values())))
+        }
+        if len(ranks) == num_classes:
+            break
+        num_classes = len(ranks)
+        for colour, signature in signatures.items():
+            classes[colour] = ranks[signature]
+    order = sorted(places, key=lambda colour: (classes[colour], colour))
+    table = bytes.maketrans(bytes(order), bytes(range(1, len(order) + 1)))
+    return [bottle.translate(table) for bottle in bottles]
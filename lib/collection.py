@@ -1,7 +1,7 @@
 """Collection stores all bottles"""
 from __future__ import annotations
 
-from typing import Union, List, Optional
+from typing import Dict, Union, List, Optional, Tuple
 from lib.item import Item
 from lib.move import Move
 from lib.bottle import Bottle
@@ -13,7 +13,7 @@ class BottleCollection:
         data: Union[BottleCollection, List[Bottle], List[List[str]]],
     ):
         """Construct a new collection from `data`."""
-        self.__unique_set: Optional[set] = None
+        self.__key: Optional[Tuple[Tuple[str, ...], ...]] = None
         self.__possible_moves: Optional[List[Move]] = None
         if isinstance(data, list):
             self.data = tuple(Bottle(item) for item in data)
@@ -24,11 +24,36 @@ class BottleCollection:
                 f"Invalid type ({data.__class__.__name__}) "
                 "used to construct BottleCollection."
             )
+        self.__count_progress()
+
+    def __count_progress(self) -> None:
+        """Count the totals `minRequiredMoves` and `is_solved` use.
+        `after_moving` updates these from the two bottles it changes
+        instead of counting them again.
+        """
+        # Sum of each bottle's `Bottle.minRequiredMoves`
+        self.__breaks = 0
+        # Number of bottles with each colour at the bottom
+        self.__bottoms: Dict[Item, int] = {}
+        # Sum over the colours of the bottles beyond the first with that
+        # colour at the bottom
+        self.__repeated_bottoms = 0
+        self.__num_solved = 0
+        for bottle in self.data:
+            if bottle.is_solved:
+                self.__num_solved += 1
+            if bottle.is_empty:
+                continue
+            self.__breaks += bottle.minRequiredMoves()
+            count = self.__bottoms.get(bottle.data[0], 0)
+            if count:
+                self.__repeated_bottoms += 1
+            self.__bottoms[bottle.data[0]] = count + 1
 
     @property
     def is_solved(self) -> bool:
         """Check if all bottles are solved."""
-        return all([bottle.is_solved for bottle in self.data])
+        return self.__num_solved == len(self.data)
 
     def copy(self) -> BottleCollection:
         """Create a new collection with the same data.
@@ -41,23 +66,7 @@ class BottleCollection:
         2. The bottom-most colors
         For example, if Red is at the bottom of three bottles, at least two moves are required.
         """
-        ret: int = 0
-        bottom_colors: List[Item] = list()
-        bc_count: List[int] = list()
-        for i in range (len(self.data)):
-            if self.data[i].is_empty: 
-                continue
-            ret += self.data[i].minRequiredMoves()
-            bc: Item = self.data[i][0]
-            if bc in bottom_colors:
-                bc_count[bottom_colors.index(bc)] += 1
-            else:
-                bottom_colors.append(bc)
-                bc_count.append(0)
-        for i in range (len(bc_count)):
-            if bc_count[i] != 0: 
-                ret += bc_count[i]
-        return ret
+        return self.__breaks + self.__repeated_bottoms
 
     # work out all possible next moves:
     def get_moves(self) -> List[Move]:
@@ -123,13 +132,67 @@ class BottleCollection:
         )
 
     def after_moving(self, move: Move) -> BottleCollection:
-        """Get a new collection after moving items"""
+        """Get a new collection after moving items.
+        Only the two bottles involved are replaced, the others are shared
+        with this collection so must not be modified directly.
+        """
         if not self.is_valid(move):
             raise ValueError("Invalid move", move)
-        _next = BottleCollection(self)
-        _next.data[move.src].pour(_next.data[move.dest])
+        src = self.data[move.src]
+        dest = self.data[move.dest]
+        new_src, new_dest = src.poured_into(dest)
+        data = list(self.data)
+        data[move.src] = new_src
+        data[move.dest] = new_dest
+        _next = BottleCollection._from_bottles(tuple(data))
+        # Only the two bottles poured change the counts so update them
+        # instead of counting every bottle again
+        _next.__num_solved = (
+            self.__num_solved
+            - src.is_solved - dest.is_solved
+            + new_src.is_solved + new_dest.is_solved
+        )
+        # The destination's top colour matches what is poured onto it, so
+        # only uncovering a different colour in the source removes a break
+        _next.__breaks = self.__breaks
+        if not new_src.is_empty and new_src.head != src.head:
+            _next.__breaks -= 1
+        _next.__bottoms = self.__bottoms
+        _next.__repeated_bottoms = self.__repeated_bottoms
+        if new_src.is_empty:
+            _next.__remove_bottom(src.data[0])
+        if dest.is_empty:
+            _next.__add_bottom(new_dest.data[0])
         return _next
 
+    def __add_bottom(self, colour: Item) -> None:
+        """Count a bottle starting with `colour` at the bottom."""
+        # The counts may be shared with the parent collection
+        self.__bottoms = dict(self.__bottoms)
+        count = self.__bottoms.get(colour, 0)
+        if count:
+            self.__repeated_bottoms += 1
+        self.__bottoms[colour] = count + 1
+
+    def __remove_bottom(self, colour: Item) -> None:
+        """Stop counting a bottle with `colour` at the bottom."""
+        self.__bottoms = dict(self.__bottoms)
+        count = self.__bottoms[colour] - 1
+        if count:
+            self.__repeated_bottoms -= 1
+            self.__bottoms[colour] = count
+        else:
+            del self.__bottoms[colour]
+
+    @classmethod
+    def _from_bottles(cls, bottles: Tuple[Bottle, ...]) -> BottleCollection:
+        """Create a collection holding `bottles` themselves, not copies."""
+        collection = cls.__new__(cls)
+        collection.__key = None
+        collection.__possible_moves = None
+        collection.data = bottles
+        return collection
+
     def __getitem__(self, x):
         """Get item for this index."""
         return self.data[x]
@@ -138,17 +201,22 @@ class BottleCollection:
         """Get the number of bottles in the collection."""
         return len(self.data)
 
-    def _unique_set(self):
-        """Get the set representing the unique bottles in the collection.
+    def key(self) -> Tuple[Tuple[str, ...], ...]:
+        """Get a hashable key that identifies the collection.
 
-        This set is cached to improve performance of comparing collections
+        The key is the sorted multiset of the bottles' colour names, so the
+        order of the bottles is ignored but repeated bottles are kept.
+        This key is cached to improve performance of comparing collections
         during the solving process and therefore is not guaranteed to be
         representative of the collection if bottle is directly modified
-        rather than using the `after` method.
+        rather than using the `after_moving` method.
         """
-        if self.__unique_set is None:
-            self.__unique_set = set(bottle.data for bottle in self.data)
-        return self.__unique_set
+        if self.__key is None:
+            self.__key = tuple(sorted(
+                tuple(item.colour.name for item in bottle.data)
+                for bottle in self.data
+            ))
+        return self.__key
 
     def __eq__(self, other: object) -> bool:
         """Check if this collection is the same as `other`.
@@ -158,13 +226,15 @@ class BottleCollection:
         be correct.
         """
         if isinstance(other, BottleCollection):
-            return self._unique_set() == other._unique_set()
+            return self.key() == other.key()
         if isinstance(other, list):
-            return self._unique_set() == set(
-                bottle.data for bottle in other
-            )
+            return self.key() == BottleCollection(other).key()
         return False
 
+    def __hash__(self) -> int:
+        """Get the hash of this collection's `key`."""
+        return hash(self.key())
+
     def __ne__(self, other: object) -> bool:
         """Check if this collection is different to `other`."""
         return not self.__eq__(other)
@@ -1,28 +1,37 @@
 """Colours for use in the game."""
 from enum import Enum
-from sty import fg, Style, RgbFg
+from functools import lru_cache
+from typing import Dict
 
-fg.li_green = Style(RgbFg(153, 255, 153))
-fg.li_blue = Style(RgbFg(102, 255, 255))
-fg.green = Style(RgbFg(102, 153, 0))
-fg.brown = Style(RgbFg(110, 79, 43))
-fg.orange = Style(RgbFg(255, 150, 50))
-fg.pink = Style(RgbFg(255, 153, 204))
+class Colour(Enum):
+    """Colours that can be used.
+    Each value holds the arguments of the `sty` foreground style used to
+    print it: a style name, a 256 colour code or an RGB triple.
+    """
 
+    RED = ("red",)
+    PINK = (255, 153, 204)
+    BROWN = (110, 79, 43)
+    GREEN = (102, 153, 0)
+    LIGHT_GREEN = (153, 255, 153)
+    DARK_GREEN = ("da_green",)
+    YELLOW = ("yellow",)
+    BLUE = ("blue",)
+    LIGHT_BLUE = (102, 255, 255)
+    DARK_BLUE = ("da_blue",)
+    GREY = (245,)
+    PURPLE = (93,)
+    ORANGE = (255, 150, 50)
 
-class Colour(Enum):
-    """Colours that can be used."""
+    @property
+    def style(self) -> str:
+        """Get the terminal escape code printing in this colour.
+        `sty` is only imported the first time a colour is printed.
+        """
+        return _styles()[self]
 
-    RED = fg.red
-    PINK = fg.pink
-    BROWN = fg.brown
-    GREEN = fg.green
-    LIGHT_GREEN = fg.li_green
-    DARK_GREEN = fg.da_green
-    YELLOW = fg.yellow
-    BLUE = fg.blue
-    LIGHT_BLUE = fg.li_blue
-    DARK_BLUE = fg.da_blue
-    GREY = fg(245)
-    PURPLE = fg(93)
-    ORANGE = fg.orange
+@lru_cache(maxsize=None)
+def _styles() -> Dict[Colour, str]:
+    """Build the terminal style of every colour."""
+    from sty import fg
+    return {colour: fg(*colour.value) for colour in Colour}
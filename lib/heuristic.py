@@ -0,0 +1,119 @@
+"""Heuristics estimating the number of moves left to solve a packed state."""
+import time
+from collections import Counter
+from typing import TYPE_CHECKING, Callable, Dict, List
+
+from lib.packed import PackedPuzzle, BottleInfo
+from lib.pattern import DEAD_END, pattern_database
+
+if TYPE_CHECKING:
+    from lib.stats import SearchStats
+
+Heuristic = Callable[[PackedPuzzle, bytes], int]
+# Heuristic of a child worked out from its parent: (puzzle, parent, the
+# parent's heuristic, src, dest, child) -> the child's heuristic
+ChildHeuristic = Callable[[PackedPuzzle, bytes, int, int, int, bytes], int]
+
+def bottom_colours(puzzle: PackedPuzzle, state: bytes) -> int:
+    """Count the breaks between colours and the repeated bottom colours.
+    This is the admissible `BottleCollection.minRequiredMoves`; a single
+    move lowers it by one at most.
+    """
+    return puzzle.min_required_moves(state)
+
+def bottom_colours_after(
+    puzzle: PackedPuzzle, state: bytes, h: int, src: int, dest: int, child: bytes
+) -> int:
+    """`bottom_colours` of `child` from `h`, that of its parent `state`,
+    without counting every bottle again.
+    """
+    return puzzle.min_required_moves_after(state, h, src, dest, child)
+
+def lookahead(puzzle: PackedPuzzle, state: bytes) -> int:
+    """Tighter admissible variant of `bottom_colours`.
+    When no move can lower `bottom_colours`, because no split colour has a
+    matching head with enough free space to go to, or an empty bottle to
+    start a new bottom, at least one extra move is needed. States without
+    any move are dead ends and get `DEAD_END`.
+    """
+    ret = puzzle.min_required_moves(state)
+    if ret == 0 or _has_improving_move(puzzle, state):
+        return ret
+    if puzzle.is_dead_end(state):
+        return DEAD_END
+    return ret + 1
+
+def weighted(puzzle: PackedPuzzle, state: bytes) -> int:
+    """Inadmissible `lookahead` doubled to make the search greedier.
+    Solutions are found faster but may not have the fewest moves.
+    """
+    return 2 * lookahead(puzzle, state)
+
+def _has_improving_move(puzzle: PackedPuzzle, state: bytes) -> bool:
+    """Check if any valid move lowers `bottom_colours` by one."""
+    cap = puzzle.capacity
+    infos: List[BottleInfo] = [puzzle.info(bottle) for bottle in puzzle.bottles(state)]
+    bottoms = Counter(state[i] for i in range(0, puzzle.size, cap) if state[i])
+    has_empty = any(info[0] == 0 for info in infos)
+    for x, (src_len, src_head, src_run, src_unique, _) in enumerate(infos):
+        if src_len == 0:
+            continue
+        if src_unique:
+            # Emptying a bottle only helps if its colour is a bottom elsewhere
+            if bottoms[src_head] < 2:
+                continue
+        elif has_empty and bottoms[src_head] == 0:
+            # Start the first bottle with this colour at the bottom
+            return True
+        for y, (dest_len, dest_head, _, _, _) in enumerate(infos):
+            if (
+                x != y
+                and dest_len != 0
+                and dest_head == src_head
+                and src_run <= cap - dest_len
+            ):
+                return True
+    return False
+
+HEURISTICS: Dict[str, Heuristic] = {
+    "bottom_colours": bottom_colours,
+    "lookahead": lookahead,
+    "weighted": weighted,
+    "pattern_database": pattern_database,
+}
+
+# Heuristics that can score a child from its parent's score
+INCREMENTAL: Dict[Heuristic, ChildHeuristic] = {
+    bottom_colours: bottom_colours_after,
+}
+
+def child_heuristic(
+    heuristic: Heuristic, timed: Heuristic, stats: "SearchStats"
+) -> ChildHeuristic:
+    """Get the function scoring the children of a state with `heuristic`.
+    Heuristics without an `INCREMENTAL` version score the child alone,
+    with `timed`, the heuristic as `SearchStats.instrument` wrapped it.
+    Incremental ones are timed here into the "heuristic" phase.
+    """
+    incremental = INCREMENTAL.get(heuristic)
+    if incremental is None:
+        return lambda puzzle, state, h, src, dest, child: timed(puzzle, child)
+    if not stats.timing:
+        return incremental
+    times = stats.phase_times
+
+    def timed_incremental(
+        puzzle: PackedPuzzle, state: bytes, h: int, src: int, dest: int, child: bytes
+    ) -> int:
+        start = time.perf_counter()
+        ret = incremental(puzzle, state, h, src, dest, child)  # type: ignore
+        times["heuristic"] += time.perf_counter() - start
+        return ret
+    return timed_incremental
+
+def get_heuristic(name: str) -> Heuristic:
+    """Get the heuristic registered as `name`."""
+    try:
+        return HEURISTICS[name]
+    except KeyError:
+        raise ValueError("Unknown heuristic", name) from None
@@ -31,7 +31,7 @@ class Item:
 
     def __str__(self):
         """Get a square of `colour` for printing."""
-        return self.colour.value + "\u25A0\x1b[39m"
+        return self.colour.style + "\u25A0\x1b[39m"
 
     def __repr__(self):
         """Get the colour's name."""
@@ -40,3 +40,7 @@ class Item:
     def __hash__(self):
         """Get the hash of the colour of this item."""
         return self.colour.__hash__()
+
+    def __reduce__(self):
+        """Pickle the item by its colour's name."""
+        return (Item, (self.colour.name,))
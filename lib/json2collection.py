@@ -3,8 +3,14 @@ import json
 from typing import TextIO, List
 
 from lib.collection import BottleCollection
+from lib.validate import check, check_data
 
 def load(file: TextIO) -> BottleCollection:
-    """Load a json file into a `BottleCollection`."""
+    """Load a json file into a `BottleCollection`.
+    Raises `UnsolvableError` for puzzles `validate` rejects.
+    """
     content: List[List[str]] = json.load(file)
-    return BottleCollection(content)
+    check_data(content)
+    collection = BottleCollection(content)
+    check(collection)
+    return collection
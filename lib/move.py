@@ -3,7 +3,7 @@ from __future__ import annotations
 from dataclasses import dataclass
 from typing import Optional
 
-@dataclass
+@dataclass(frozen=True)
 class Move:
     src: int
     dest: int
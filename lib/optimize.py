@@ -0,0 +1,154 @@
+"""Shortening of the solutions found by any solver."""
+from collections import deque
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from lib.canonical import canonical_order
+from lib.collection import BottleCollection
+from lib.move import Move
+from lib.packed import PackedPuzzle
+from lib.search import State
+
+# (src, dest) of a move between packed states
+Pour = Tuple[int, int]
+
+def optimize(
+    root: BottleCollection,
+    result: State,
+    horizon: int = 6,
+    max_nodes: int = 5000,
+) -> State:
+    """Get `result`, a solution of `root`, with its moves `shorten`ed."""
+    moves = shorten(root, result.moves, horizon, max_nodes)
+    if len(moves) >= len(result.moves):
+        return result
+    puzzle, state = PackedPuzzle.from_collection(root)
+    for move in moves:
+        state = puzzle.after_moving(state, move.src, move.dest)
+    return State(puzzle.unpack(state), moves)
+
+def shorten(
+    root: BottleCollection,
+    moves: Sequence[Move],
+    horizon: int = 6,
+    max_nodes: int = 5000,
+) -> Tuple[Move, ...]:
+    """Get a sequence of moves reaching the same state as `moves` from
+    `root`, up to the order of the bottles, that is usually shorter.
+
+    The moves are replayed and the moves between two visits of the same
+    state, told by its canonical key, are cut out. Then the states
+    `horizon` moves apart are joined by a breadth first search of at most
+    `max_nodes` states, which also merges pairs of pours that a single pour
+    can replace. A state reached with its bottles in another order than
+    before renumbers the bottles of the moves after it.
+    """
+    puzzle, start = PackedPuzzle.from_collection(root)
+    pours = [(move.src, move.dest) for move in moves]
+    pours = _remove_cycles(puzzle, start, pours)
+    for window in range(2, horizon + 1):
+        pours = _shortcut(puzzle, start, pours, window, max_nodes)
+    return tuple(Move(src, dest) for src, dest in pours)
+
+def _replay(puzzle: PackedPuzzle, start: bytes, pours: List[Pour]) -> List[bytes]:
+    """Get the states `pours` go through from `start`, both ends included."""
+    states = [start]
+    for src, dest in pours:
+        states.append(puzzle.after_moving(states[-1], src, dest))
+    return states
+
+def _renumbering(puzzle: PackedPuzzle, old: bytes, new: bytes) -> List[int]:
+    """Get the index in `new` of each bottle of `old`, which holds the same
+    bottles in another order.
+    """
+    _, old_order = canonical_order(puzzle.bottles(old))
+    _, new_order = canonical_order(puzzle.bottles(new))
+    ret = [0] * puzzle.num_bottles
+    for old_index, new_index in zip(old_order, new_order):
+        ret[old_index] = new_index
+    return ret
+
+def _remove_cycles(
+    puzzle: PackedPuzzle, start: bytes, pours: List[Pour]
+) -> List[Pour]:
+    """Cut the pours between the first and last visit of each state."""
+    states = _replay(puzzle, start, pours)
+    last = {puzzle.key(state): i for i, state in enumerate(states)}
+    ret: List[Pour] = []
+    # Index in the state reached by `ret` of each bottle of `states[i]`
+    renumber = list(range(puzzle.num_bottles))
+    i = 0
+    while True:
+        j = last[puzzle.key(states[i])]
+        if j != i:
+            inner = _renumbering(puzzle, states[j], states[i])
+            renumber = [renumber[index] for index in inner]
+            i = j
+        if i == len(pours):
+            return ret
+        src, dest = pours[i]
+        ret.append((renumber[src], renumber[dest]))
+        i += 1
+
+def _shortcut(
+    puzzle: PackedPuzzle,
+    start: bytes,
+    pours: List[Pour],
+    window: int,
+    max_nodes: int,
+) -> List[Pour]:
+    """Replace each run of `window` pours by fewer pours where possible."""
+    states = _replay(puzzle, start, pours)
+    i = 0
+    while i + window <= len(pours):
+        found = _search(
+            puzzle, states[i], puzzle.key(states[i + window]), window - 1, max_nodes
+        )
+        if found is None:
+            i += 1
+            continue
+        path, end = found
+        renumber = _renumbering(puzzle, states[i + window], end)
+        pours = pours[:i] + path + [
+            (renumber[src], renumber[dest]) for src, dest in pours[i + window:]
+        ]
+        states = states[:i] + _replay(puzzle, states[i], pours[i:])
+    return pours
+
+def _search(
+    puzzle: PackedPuzzle,
+    start: bytes,
+    target: bytes,
+    max_depth: int,
+    max_nodes: int,
+) -> Optional[Tuple[List[Pour], bytes]]:
+    """Breadth first search for a state with the key `target` at most
+    `max_depth` pours from `start`. Get the pours and the state found, or
+    None if it is not found within `max_nodes` states.
+    """
+    parents: Dict[bytes, Tuple[Optional[bytes], Pour]] = {
+        puzzle.key(start): (None, (-1, -1))
+    }
+    frontier = deque([(start, 0)])
+    while frontier:
+        state, depth = frontier.popleft()
+        if depth == max_depth:
+            continue
+        for src, dest in puzzle.get_moves(state):
+            child = puzzle.after_moving(state, src, dest)
+            key = puzzle.key(child)
+            if key in parents:
+                continue
+            parents[key] = (puzzle.key(state), (src, dest))
+            if key == target:
+                path: List[Pour] = []
+                node: Optional[bytes] = key
+                while node is not None:
+                    parent, pour = parents[node]
+                    if parent is not None:
+                        path.append(pour)
+                    node = parent
+                return path[::-1], child
+            if len(parents) >= max_nodes:
+                return None
+            frontier.append((child, depth + 1))
+    return None
@@ -0,0 +1,326 @@
+"""Compact integer encoding of a collection used by the search core."""
+from __future__ import annotations
+
+from collections import Counter
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from lib.bottle import Bottle
+from lib.canonical import canonical_key
+from lib.collection import BottleCollection
+
+# Value used for the free slots of a bottle
+EMPTY = 0
+
+# (length, head colour, num matching head, is unique, number of breaks)
+BottleInfo = Tuple[int, int, int, bool, int]
+
+
+class PackedPuzzle:
+    """Static description of a puzzle whose states are packed into bytes.
+
+    Colours are numbered from 1 and every bottle takes `capacity` bytes of
+    the state, bottom item first and padded with `EMPTY`. A whole state is
+    therefore a single hashable `bytes` object and a move only rewrites the
+    slices of the two bottles involved.
+    """
+    def __init__(
+        self,
+        colours: Sequence[str],
+        num_bottles: int,
+        capacity: int,
+        colour_symmetry: bool = False,
+        prune: bool = False,
+    ):
+        """Create a puzzle of `num_bottles` bottles holding `colours`.
+        With `colour_symmetry` states that only differ by swapping colours
+        share a `key`. With `prune` dominated moves are left out of
+        `get_moves` and the rest are ordered best first.
+        """
+        if len(colours) > 255:
+            raise ValueError("Too many colours to pack", len(colours))
+        self.colours = tuple(colours)
+        self.num_bottles = num_bottles
+        self.capacity = capacity
+        self.size = num_bottles * capacity
+        self.colour_symmetry = colour_symmetry
+        self.prune = prune
+        self.__codes = {name: code + 1 for code, name in enumerate(self.colours)}
+        # Bottles repeat a lot between states so their properties are cached
+        self.__info: Dict[bytes, BottleInfo] = {}
+
+    @classmethod
+    def from_collection(
+        cls,
+        collection: BottleCollection,
+        colour_symmetry: bool = False,
+        prune: bool = False,
+    ) -> Tuple[PackedPuzzle, bytes]:
+        """Create a puzzle for `collection` and get its packed state."""
+        capacities = set(bottle.capacity for bottle in collection.data)
+        if len(capacities) > 1:
+            raise ValueError("Bottles must share a capacity", capacities)
+        colours: List[str] = []
+        for bottle in collection.data:
+            for item in bottle.data:
+                if item.colour.name not in colours:
+                    colours.append(item.colour.name)
+        puzzle = cls(
+            colours,
+            len(collection),
+            capacities.pop() if capacities else 4,
+            colour_symmetry,
+            prune,
+        )
+        return puzzle, puzzle.pack(collection)
+
+    def pack(self, collection: BottleCollection) -> bytes:
+        """Get the packed state of `collection`."""
+        if len(collection) != self.num_bottles:
+            raise ValueError("Wrong number of bottles", len(collection))
+        state = bytearray(self.size)
+        for i, bottle in enumerate(collection.data):
+            if len(bottle) > self.capacity:
+                raise ValueError("Bottle over capacity", i)
+            start = i * self.capacity
+            for j, item in enumerate(bottle.data):
+                state[start + j] = self.__codes[item.colour.name]
+        return bytes(state)
+
+    def unpack(self, state: bytes) -> BottleCollection:
+        """Get the `BottleCollection` represented by `state`."""
+        return BottleCollection([
+            Bottle(
+                [self.colours[code - 1] for code in bottle if code != EMPTY],
+                self.capacity,
+            )
+            for bottle in self.bottles(state)
+        ])
+
+    def bottles(self, state: bytes) -> List[bytes]:
+        """Split `state` into the slices of each bottle."""
+        cap = self.capacity
+        return [state[i:i + cap] for i in range(0, self.size, cap)]
+
+    def info(self, bottle: bytes) -> BottleInfo:
+        """Get the cached properties of a packed bottle."""
+        info = self.__info.get(bottle)
+        if info is None:
+            length = len(bottle.rstrip(b"\x00"))
+            head = bottle[length - 1] if length else EMPTY
+            run = 0
+            while run < length and bottle[length - 1 - run] == head:
+                run += 1
+            breaks = sum(
+                1 for i in range(1, length) if bottle[i] != bottle[i - 1]
+            )
+            info = (length, head, run, run == length, breaks)
+            self.__info[bottle] = info
+        return info
+
+    def key(self, state: bytes) -> bytes:
+        """Get the canonical key of `state`, see `canonical_key`."""
+        return canonical_key(self.bottles(state), self.colour_symmetry)
+
+    def is_solved(self, state: bytes) -> bool:
+        """Check if every bottle is empty or full of a single colour."""
+        for bottle in self.bottles(state):
+            length, _, _, unique, _ = self.info(bottle)
+            if length != 0 and not (unique and length == self.capacity):
+                return False
+        return True
+
+    def min_required_moves(self, state: bytes) -> int:
+        """Packed equivalent of `BottleCollection.minRequiredMoves`."""
+        ret = 0
+        bottoms = []
+        for bottle in self.bottles(state):
+            ret += self.info(bottle)[4]
+            if bottle[0] != EMPTY:
+                bottoms.append(bottle[0])
+        return ret + len(bottoms) - len(set(bottoms))
+
+    def min_required_moves_after(
+        self, state: bytes, before: int, src: int, dest: int, child: bytes
+    ) -> int:
+        """Get `min_required_moves` of `child`, which is `state` after
+        pouring `src` into `dest`, from its value `before` for `state`.
+        Only the two bottles poured and the bottom colours are looked at,
+        as `BottleCollection.after_moving` does.
+        """
+        cap = self.capacity
+        src_len, src_head, src_run, _, _ = self.info(state[src * cap:(src + 1) * cap])
+        dest_len = self.info(state[dest * cap:(dest + 1) * cap])[0]
+        amount = min(src_run, cap - dest_len)
+        ret = before
+        # Uncovering another colour in the source removes a break, the
+        # destination's top colour matches what is poured onto it
+        if amount == src_run and src_len > amount:
+            ret -= 1
+        # Only emptying the source or filling an empty destination changes
+        # the bottoms, and only the bottoms of the colour poured
+        if (amount == src_len) != (dest_len == 0):
+            before_count = state[::cap].count(src_head)
+            after_count = child[::cap].count(src_head)
+            ret += max(after_count - 1, 0) - max(before_count - 1, 0)
+        return ret
+
+    def get_moves(self, state: bytes) -> List[Tuple[int, int]]:
+        """Get the (src, dest) pairs `BottleCollection.get_moves` allows."""
+        cap = self.capacity
+        infos = [self.info(bottle) for bottle in self.bottles(state)]
+        moves: List[Tuple[int, int]] = []
+        for x, (src_len, src_head, src_run, src_unique, _) in enumerate(infos):
+            # Skip solved, empty and mostly sorted bottles
+            if src_len == 0 or (src_unique and (src_len == cap or src_len > 2)):
+                continue
+            used_in_empty = False
+            for y, (dest_len, dest_head, _, _, _) in enumerate(infos):
+                if x == y or src_run > cap - dest_len:
+                    continue
+                if dest_len == 0:
+                    if src_unique or used_in_empty:
+                        continue
+                    used_in_empty = True
+                elif dest_head != src_head:
+                    continue
+                moves.append((x, y))
+        if self.prune:
+            return self.__prune(infos, moves)
+        return moves
+
+    def is_dead_end(self, state: bytes) -> bool:
+        """Check if `state` is not solved but has no move `get_moves`
+        allows. Without an empty bottle this means no bottle can take
+        another's head, so no bottle can ever be freed.
+        """
+        return not self.get_moves(state) and not self.is_solved(state)
+
+    def __prune(
+        self, infos: List[BottleInfo], moves: List[Tuple[int, int]]
+    ) -> List[Tuple[int, int]]:
+        """Drop the dominated `moves` and order the rest best first.
+
+        Between two bottles holding a single colour, only the pour from
+        the shorter one is kept, as pouring either way gives the same key.
+        Nothing is poured onto a mixed or an empty bottle while another
+        bottle of just its colour has room for it. The moves left are
+        ordered: those solving a bottle, those adding to a bottle of a
+        single colour, those emptying their source, the rest and finally
+        those starting a new bottle.
+        """
+        cap = self.capacity
+        # Single coloured bottles by colour
+        sorted_bottles: Dict[int, List[int]] = {}
+        for i, (length, head, _, unique, _) in enumerate(infos):
+            if length and unique:
+                sorted_bottles.setdefault(head, []).append(i)
+        ranked: List[Tuple[int, int, int]] = []
+        for x, y in moves:
+            src_len, src_head, src_run, src_unique, _ = infos[x]
+            dest_len, _, _, dest_unique, _ = infos[y]
+            if src_unique and dest_len and dest_unique:
+                if (src_len, x) > (dest_len, y):
+                    continue
+            elif not (dest_unique and dest_len) and any(
+                i != x and infos[i][0] + src_run <= cap
+                for i in sorted_bottles.get(src_head, ())
+            ):
+                continue
+            if dest_unique and dest_len:
+                rank = 0 if dest_len + src_run == cap else 1
+            elif src_run == src_len:
+                rank = 2
+            elif dest_len == 0:
+                rank = 4
+            else:
+                rank = 3
+            ranked.append((rank, x, y))
+        ranked.sort(key=lambda move: move[0])
+        return [(x, y) for _, x, y in ranked]
+
+    def after_moving(self, state: bytes, src: int, dest: int) -> bytes:
+        """Get the state after pouring bottle `src` into bottle `dest`."""
+        cap = self.capacity
+        src_start = src * cap
+        dest_start = dest * cap
+        src_len, src_head, src_run, _, _ = self.info(
+            state[src_start:src_start + cap]
+        )
+        dest_len, dest_head, _, _, _ = self.info(
+            state[dest_start:dest_start + cap]
+        )
+        amount = min(src_run, cap - dest_len)
+        if (
+            src == dest
+            or amount == 0
+            or (dest_len != 0 and dest_head != src_head)
+        ):
+            raise ValueError("Invalid move", (src, dest))
+        src_end = src_start + src_len
+        dest_end = dest_start + dest_len
+        _next = bytearray(state)
+        _next[dest_end:dest_end + amount] = state[src_end - amount:src_end]
+        _next[src_end - amount:src_end] = bytes(amount)
+        return bytes(_next)
+
+    def goal(self, state: bytes) -> Optional[bytes]:
+        """Get the canonical solved state with the items of `state`, with
+        each colour filling whole bottles and the other bottles empty.
+        Returns None if a colour cannot fill whole bottles.
+        """
+        counts = Counter(code for code in state if code != EMPTY)
+        bottles: List[bytes] = []
+        for code, count in counts.items():
+            if count % self.capacity:
+                return None
+            bottles.extend([bytes([code]) * self.capacity] * (count // self.capacity))
+        if len(bottles) > self.num_bottles:
+            return None
+        bottles.extend([bytes(self.capacity)] * (self.num_bottles - len(bottles)))
+        return canonical_key(bottles)
+
+    def predecessors(self, state: bytes) -> List[bytes]:
+        """Get the states that a move from `get_moves` turns into `state`.
+
+        Each is found by pouring back the top items of a bottle. Which
+        empty bottle a move pours into does not change the `key` of the
+        result, so unlike `get_moves` any empty bottle may be poured from.
+        """
+        cap = self.capacity
+        bottles = self.bottles(state)
+        infos = [self.info(bottle) for bottle in bottles]
+        ret: List[bytes] = []
+        # Bottles that only differ by position give states with the same
+        # key, so each distinct bottle is only used once on each side
+        poured = set()
+        for y, (dest_len, dest_head, dest_run, dest_unique, _) in enumerate(infos):
+            if dest_len == 0 or bottles[y] in poured:
+                continue
+            poured.add(bottles[y])
+            sources = set()
+            for x, (src_len, src_head, _, _, _) in enumerate(infos):
+                if (
+                    x == y
+                    or bottles[x] in sources
+                    or (src_len != 0 and src_head == dest_head)
+                ):
+                    continue
+                sources.add(bottles[x])
+                for amount in range(1, min(dest_run, cap - src_len) + 1):
+                    # A whole run is poured, so the destination's head was
+                    # another colour unless it was empty
+                    if amount == dest_run and not dest_unique:
+                        continue
+                    # A single coloured source is not poured into an empty
+                    # bottle or poured at all if mostly sorted
+                    if src_len == 0 and (
+                        amount == dest_len or amount > 2 or amount == cap
+                    ):
+                        continue
+                    _prev = bytearray(state)
+                    src_end = x * cap + src_len
+                    dest_end = y * cap + dest_len
+                    _prev[src_end:src_end + amount] = bytes([dest_head]) * amount
+                    _prev[dest_end - amount:dest_end] = bytes(amount)
+                    ret.append(bytes(_prev))
+        return ret
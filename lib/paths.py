@@ -0,0 +1,58 @@
+"""Compact storage of the paths explored by a search."""
+import math
+from array import array
+from typing import List, Optional, Tuple, Union
+
+from lib.move import Move
+
+# Node of the empty path at the root of the search
+ROOT = -1
+
+def from_double(value: float) -> Union[int, float, None]:
+    """Decode a number stored as a double, NaN standing for None."""
+    if math.isnan(value):
+        return None
+    if value.is_integer():
+        return int(value)
+    return value
+
+class PathTree:
+    """Moves of the paths found by a search stored as parent pointers.
+
+    A path is the number of its last node, and each node only holds the
+    number of the node before it, the code of its move and the move's
+    score. Extending a path therefore takes constant time and memory, and
+    the moves are only rebuilt for the paths that are kept.
+    """
+    def __init__(self, num_bottles: int):
+        """Create an empty tree for moves between `num_bottles` bottles."""
+        self.num_bottles = num_bottles
+        self.parents = array("i")
+        # src * num_bottles + dest
+        self.codes = array("I")
+        self.scores = array("d")
+
+    def add(
+        self, parent: int, src: int, dest: int, score: Optional[float] = None
+    ) -> int:
+        """Get the node of the path `parent` followed by pouring `src` into
+        `dest`.
+        """
+        self.parents.append(parent)
+        self.codes.append(src * self.num_bottles + dest)
+        self.scores.append(math.nan if score is None else score)
+        return len(self.parents) - 1
+
+    def moves(self, node: int) -> Tuple[Move, ...]:
+        """Get the moves of the path ending at `node`."""
+        ret: List[Move] = []
+        while node != ROOT:
+            src, dest = divmod(self.codes[node], self.num_bottles)
+            ret.append(Move(src, dest, from_double(self.scores[node])))  # type: ignore
+            node = self.parents[node]
+        ret.reverse()
+        return tuple(ret)
+
+    def __len__(self) -> int:
+        """Get the number of nodes."""
+        return len(self.parents)
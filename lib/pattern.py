@@ -0,0 +1,322 @@
+"""Pattern database heuristics built offline by `build_patterns.py`.
+
+A pattern keeps the colours of a group apart and turns every other colour
+into one wildcard colour. Moving wildcards costs nothing and any number
+of the items on top of a bottle may be poured, so every move of the real
+puzzle is also a move of the pattern. The fewest moves of the group's
+colours needed to sort the pattern is therefore a lower bound, and as
+each move only moves one colour the bounds of disjoint groups add up.
+
+As wildcards move for free, the bottles without any colour of the group
+can be rearranged at will: only the bottles holding the group's colours
+are stored and the rest is implied by the counts of items and bottles.
+"""
+from __future__ import annotations
+
+import itertools
+import mmap
+import pathlib
+import struct
+import weakref
+from collections import Counter, deque
+from typing import Dict, Iterator, List, Optional, Sequence, Set, Tuple
+
+from lib.packed import EMPTY, PackedPuzzle
+
+# Directory the databases are built to and loaded from
+PATTERN_DIR = pathlib.Path(__file__).resolve().parent.parent / "patterns"
+
+# Colours per group used by default
+DEFAULT_PATTERN = 1
+
+# Stored for states of the pattern that cannot be sorted
+UNSOLVABLE = 255
+
+# Returned by the heuristic for states that cannot be solved
+DEAD_END = 1 << 20
+
+# Magic, number of bottles, capacity, colours in the pattern, other
+# items and number of entries. Each entry is a key and a distance byte.
+_MAGIC = b"WSPDB\x00\x00\x01"
+_HEADER = struct.Struct("<8sBBBHI")
+
+# Pads keys to a fixed length, sorting after every real bottle
+_PADDING = 0xFF
+
+Shape = Tuple[int, int, int, int]
+
+def file_name(num_bottles: int, capacity: int, pattern: int, others: int) -> str:
+    """Get the name of the database file for a shape of pattern."""
+    return f"b{num_bottles}_c{capacity}_p{pattern}_x{others}.pdb"
+
+def _key_bottles(num_bottles: int, capacity: int, pattern: int) -> int:
+    """Get the most bottles that can hold the colours of a pattern."""
+    return min(num_bottles, pattern * capacity)
+
+def _key(bottles: Sequence[bytes], capacity: int, key_bottles: int) -> bytes:
+    """Get the key of the sorted, padded `bottles` of a pattern."""
+    padding = bytes([_PADDING]) * capacity * (key_bottles - len(bottles))
+    return b"".join(bottles) + padding
+
+class PatternDatabase:
+    """Distances of the states of one pattern read from a database file.
+
+    The file is memory mapped and searched on demand, and each distance
+    looked up is kept in memory.
+    """
+    def __init__(self, path: str):
+        """Open the database at `path`."""
+        with open(path, "rb") as fh:
+            self.__map = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, num_bottles, capacity, pattern, others, entries = _HEADER.unpack_from(
+            self.__map
+        )
+        if magic != _MAGIC:
+            raise ValueError("Not a pattern database", path)
+        self.shape: Shape = (num_bottles, capacity, pattern, others)
+        self.capacity = capacity
+        self.pattern = pattern
+        self.entries = entries
+        self.key_bottles = _key_bottles(num_bottles, capacity, pattern)
+        self.__key_size = self.key_bottles * capacity
+        self.__entry_size = self.__key_size + 1
+        self.__cache: Dict[bytes, int] = {}
+
+    def distance(self, key: bytes) -> int:
+        """Get the distance stored for `key`, `UNSOLVABLE` if it is not."""
+        ret = self.__cache.get(key)
+        if ret is not None:
+            return ret
+        low = 0
+        high = self.entries
+        ret = UNSOLVABLE
+        while low < high:
+            middle = (low + high) // 2
+            start = _HEADER.size + middle * self.__entry_size
+            found = self.__map[start:start + self.__key_size]
+            if found < key:
+                low = middle + 1
+            elif found > key:
+                high = middle
+            else:
+                ret = self.__map[start + self.__key_size]
+                break
+        self.__cache[key] = ret
+        return ret
+
+    def close(self) -> None:
+        """Unmap the file."""
+        self.__map.close()
+
+def _states(
+    num_bottles: int, capacity: int, pattern: int, others: int
+) -> Iterator[Tuple[bytes, ...]]:
+    """Get every state of a pattern as its sorted bottles."""
+    wildcard = pattern + 1
+    kinds = sorted(
+        bytes(contents) + bytes(capacity - length)
+        for length in range(1, capacity + 1)
+        for contents in itertools.product(range(1, wildcard + 1), repeat=length)
+        if any(item != wildcard for item in contents)
+    )
+    counts = [Counter(kind) for kind in kinds]
+
+    def fill(
+        start: int, chosen: List[bytes], left: Counter
+    ) -> Iterator[Tuple[bytes, ...]]:
+        if all(left[colour] == 0 for colour in range(1, wildcard)):
+            outside = num_bottles - len(chosen)
+            if left[wildcard] <= outside * capacity:
+                yield tuple(chosen)
+            return
+        if len(chosen) == num_bottles:
+            return
+        for i in range(start, len(kinds)):
+            if all(left[colour] >= count for colour, count in counts[i].items() if colour):
+                chosen.append(kinds[i])
+                yield from fill(i, chosen, left - counts[i])
+                chosen.pop()
+
+    left = Counter({colour: capacity for colour in range(1, wildcard)})
+    left[wildcard] = others
+    yield from fill(0, [], left)
+
+def _successors(
+    state: Tuple[bytes, ...], num_bottles: int, capacity: int, pattern: int, others: int
+) -> Iterator[Tuple[Tuple[bytes, ...], int]]:
+    """Get the (state, cost) of each move of a pattern from `state`."""
+    wildcard = pattern + 1
+    lengths = [len(bottle.rstrip(b"\x00")) for bottle in state]
+    outside = num_bottles - len(state)
+    outside_items = others - sum(bottle.count(wildcard) for bottle in state)
+    outside_room = outside * capacity - outside_items
+    has_empty = outside > 0 and outside_items <= (outside - 1) * capacity
+
+    def moved(changes: Dict[int, bytes], added: Optional[bytes] = None) -> Tuple[bytes, ...]:
+        bottles = [changes.get(i, bottle) for i, bottle in enumerate(state)]
+        if added is not None:
+            bottles.append(added)
+        # Bottles left with only wildcards join the others
+        return tuple(sorted(
+            bottle for bottle in bottles
+            if any(0 < item < wildcard for item in bottle)
+        ))
+
+    def poured(bottle: bytes, length: int, colour: int, amount: int) -> bytes:
+        return bottle[:length] + bytes([colour]) * amount + bytes(capacity - length - amount)
+
+    for x, bottle in enumerate(state):
+        length = lengths[x]
+        head = bottle[length - 1]
+        run = 1
+        while run < length and bottle[length - 1 - run] == head:
+            run += 1
+        cost = 0 if head == wildcard else 1
+        for amount in range(1, run + 1):
+            rest = bottle[:length - amount] + bytes(capacity - length + amount)
+            for y, dest in enumerate(state):
+                if (
+                    y != x
+                    and lengths[y] + amount <= capacity
+                    and dest[lengths[y] - 1] == head
+                ):
+                    yield moved({x: rest, y: poured(dest, lengths[y], head, amount)}), cost
+            if head == wildcard:
+                if amount <= outside_room:
+                    yield moved({x: rest}), 0
+            elif has_empty:
+                yield moved({x: rest}, poured(bytes(capacity), 0, head, amount)), 1
+    # Wildcards from the other bottles onto those of the pattern
+    for y, dest in enumerate(state):
+        if dest[lengths[y] - 1] != wildcard:
+            continue
+        for amount in range(1, min(capacity - lengths[y], outside_items) + 1):
+            yield moved({y: poured(dest, lengths[y], wildcard, amount)}), 0
+
+def build(
+    num_bottles: int, capacity: int, pattern: int, others: int
+) -> Dict[bytes, int]:
+    """Get the key and distance of every state of a pattern of `pattern`
+    colours with `others` wildcards in `num_bottles` bottles.
+    """
+    key_bottles = _key_bottles(num_bottles, capacity, pattern)
+    states = list(_states(num_bottles, capacity, pattern, others))
+    goal = tuple(sorted(bytes([colour]) * capacity for colour in range(1, pattern + 1)))
+    # Search backward from the goal along the reversed moves
+    parents: Dict[Tuple[bytes, ...], List[Tuple[Tuple[bytes, ...], int]]] = {}
+    for state in states:
+        for child, cost in set(_successors(state, num_bottles, capacity, pattern, others)):
+            parents.setdefault(child, []).append((state, cost))
+    distances: Dict[Tuple[bytes, ...], int] = {goal: 0}
+    queue = deque([goal])
+    while queue:
+        state = queue.popleft()
+        distance = distances[state]
+        for parent, cost in parents.get(state, ()):
+            known = distances.get(parent)
+            if known is None or distance + cost < known:
+                distances[parent] = distance + cost
+                # Free moves go first so states leave the queue in order
+                if cost:
+                    queue.append(parent)
+                else:
+                    queue.appendleft(parent)
+    return {
+        _key(state, capacity, key_bottles): min(distances.get(state, UNSOLVABLE), UNSOLVABLE)
+        for state in states
+    }
+
+def save(
+    path: str, shape: Shape, distances: Dict[bytes, int]
+) -> None:
+    """Write `distances` of a pattern of `shape` as a database file."""
+    with open(path, "wb") as fh:
+        fh.write(_HEADER.pack(_MAGIC, *shape, len(distances)))
+        for key in sorted(distances):
+            fh.write(key)
+            fh.write(bytes([distances[key]]))
+
+def shapes(puzzle: PackedPuzzle, pattern: int = DEFAULT_PATTERN) -> Set[Shape]:
+    """Get the shapes of the databases `pattern_database` uses for `puzzle`."""
+    num_colours = len(puzzle.colours)
+    ret = set()
+    for start in range(0, num_colours, pattern):
+        size = min(pattern, num_colours - start)
+        others = (num_colours - size) * puzzle.capacity
+        ret.add((puzzle.num_bottles, puzzle.capacity, size, others))
+    return ret
+
+# Databases loaded so far by shape, None if there is no file for it
+_loaded: Dict[Shape, Optional[PatternDatabase]] = {}
+
+def load(shape: Shape, directory: pathlib.Path = PATTERN_DIR) -> Optional[PatternDatabase]:
+    """Get the database of `shape`, loading it on first use."""
+    if shape not in _loaded:
+        path = directory / file_name(*shape)
+        _loaded[shape] = PatternDatabase(str(path)) if path.exists() else None
+    return _loaded[shape]
+
+class _Groups:
+    """The groups of colours of a puzzle that have a database."""
+    def __init__(self, puzzle: PackedPuzzle, state: bytes):
+        """Find the databases for the colours of `puzzle` in `state`."""
+        self.databases: List[PatternDatabase] = []
+        self.__tables: List[bytes] = []
+        self.__group_of: Dict[int, int] = {}
+        # The abstract bottles each bottle gives to the groups it holds
+        self.__split: Dict[bytes, List[Tuple[int, bytes]]] = {}
+        num_colours = len(puzzle.colours)
+        counts = Counter(state)
+        # The databases assume every colour fills exactly one bottle
+        if any(counts[colour] != puzzle.capacity for colour in range(1, num_colours + 1)):
+            return
+        for start in range(0, num_colours, DEFAULT_PATTERN):
+            colours = range(start + 1, min(start + DEFAULT_PATTERN, num_colours) + 1)
+            others = (num_colours - len(colours)) * puzzle.capacity
+            database = load((puzzle.num_bottles, puzzle.capacity, len(colours), others))
+            if database is None:
+                continue
+            table = bytearray([len(colours) + 1]) * 256
+            table[EMPTY] = EMPTY
+            for code, colour in enumerate(colours, 1):
+                table[colour] = code
+                self.__group_of[colour] = len(self.databases)
+            self.databases.append(database)
+            self.__tables.append(bytes(table))
+
+    def split(self, bottle: bytes) -> List[Tuple[int, bytes]]:
+        """Get the (group, abstract bottle) of each group in `bottle`."""
+        ret = self.__split.get(bottle)
+        if ret is None:
+            groups = sorted(set(
+                self.__group_of[colour] for colour in bottle if colour in self.__group_of
+            ))
+            ret = [(group, bottle.translate(self.__tables[group])) for group in groups]
+            self.__split[bottle] = ret
+        return ret
+
+# The groups of each puzzle the heuristic was used on
+_groups: weakref.WeakKeyDictionary = weakref.WeakKeyDictionary()
+
+def pattern_database(puzzle: PackedPuzzle, state: bytes) -> int:
+    """Sum the pattern database distances of the groups of colours.
+    Groups without a database built are left out, and the result is never
+    below `bottom_colours`. States a pattern cannot sort get `DEAD_END`.
+    """
+    groups = _groups.get(puzzle)
+    if groups is None:
+        groups = _groups[puzzle] = _Groups(puzzle, state)
+    found: List[List[bytes]] = [[] for _ in groups.databases]
+    for bottle in puzzle.bottles(state):
+        for group, abstract in groups.split(bottle):
+            found[group].append(abstract)
+    total = 0
+    for database, bottles in zip(groups.databases, found):
+        bottles.sort()
+        distance = database.distance(
+            _key(bottles, puzzle.capacity, database.key_bottles)
+        )
+        if distance == UNSOLVABLE:
+            return DEAD_END
+        total += distance
+    return max(total, puzzle.min_required_moves(state))
@@ -0,0 +1,112 @@
+"""Race several solvers on the same puzzle in separate processes."""
+import multiprocessing
+import queue
+import time
+from typing import Any, Dict, List, Optional, Sequence, Set, Tuple
+
+from lib.collection import BottleCollection
+from lib.search import State, solve
+from lib.stats import SearchStats
+
+# An algorithm from `SOLVERS` and the options to call it with
+Config = Tuple[str, Dict[str, Any]]
+
+# Seconds between checks for workers that died without reporting
+POLL_INTERVAL = 0.1
+
+DEFAULT_PORTFOLIO: List[Config] = [
+    ("weighted_A_star", {}),
+    ("A_star", {}),
+    ("A_star", {"heuristic": "lookahead"}),
+    ("ida_star", {"heuristic": "lookahead"}),
+    ("beam_search", {"width": 500}),
+    ("dfs", {}),
+]
+
+def _run(results: Any, index: int, root: BottleCollection, config: Config) -> None:
+    """Solve `root` with `config` in a worker and report the outcome."""
+    algorithm, options = config
+    stats = SearchStats()
+    try:
+        result = solve(root, algorithm, stats=stats, **options)
+    except Exception:  # Report a failed solver instead of leaving the race hanging
+        result = None
+    results.put((index, result, stats))
+
+def race(
+    root: BottleCollection,
+    configs: Optional[Sequence[Config]] = None,
+    deadline: Optional[float] = None,
+    shortest: bool = False,
+) -> Optional[Tuple[Config, State, SearchStats]]:
+    """Solve `root` with every config at once and keep the winning solution.
+
+    By default the first solution found wins. With `shortest` the race
+    goes on until every solver finishes or `deadline` seconds pass, and the
+    solution with the fewest moves wins. All solvers still running when the
+    race ends are terminated. Returns the winning config, its solution and
+    its stats, or None if nothing was solved in time.
+    """
+    if configs is None:
+        configs = DEFAULT_PORTFOLIO
+    context = multiprocessing.get_context()
+    results = context.Queue()
+    workers = [
+        context.Process(target=_run, args=(results, i, root, config), daemon=True)
+        for i, config in enumerate(configs)
+    ]
+    for worker in workers:
+        worker.start()
+    end_time = None if deadline is None else time.monotonic() + deadline
+    best: Optional[Tuple[Config, State, SearchStats]] = None
+    # Workers that reported or died
+    finished: Set[int] = set()
+    try:
+        while len(finished) < len(workers):
+            timeout = POLL_INTERVAL
+            if end_time is not None:
+                timeout = min(timeout, end_time - time.monotonic())
+                if timeout <= 0:
+                    break
+            try:
+                index, result, stats = results.get(timeout=timeout)
+            except queue.Empty:
+                # A worker killed by a signal, e.g. by the OOM killer,
+                # never reports. One that exits normally has reported.
+                for i, worker in enumerate(workers):
+                    if worker.exitcode not in (None, 0):
+                        finished.add(i)
+                continue
+            finished.add(index)
+            if result is None:
+                continue
+            if best is None or len(result.moves) < len(best[1].moves):
+                best = (configs[index], result, stats)
+            if not shortest:
+                break
+    finally:
+        for worker in workers:
+            if worker.is_alive():
+                worker.terminate()
+        for worker in workers:
+            worker.join()
+        results.close()
+        results.cancel_join_thread()
+    return best
+
+def portfolio(
+    root: BottleCollection,
+    configs: Optional[Sequence[Config]] = None,
+    deadline: Optional[float] = None,
+    shortest: bool = False,
+    stats: Optional[SearchStats] = None,
+) -> Optional[State]:
+    """Solver interface to `race`, filling `stats` from the winner."""
+    winner = race(root, configs, deadline, shortest)
+    if winner is None:
+        return None
+    if stats is not None:
+        for name, value in winner[2].as_dict().items():
+            if name != "branching":
+                setattr(stats, name, value)
+    return winner[1]
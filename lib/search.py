@@ -1,10 +1,18 @@
 """Implementation of search algorithms."""
-from typing import List, Optional, Tuple, Any
+from typing import Callable, Dict, List, Optional, Tuple, Union, Any
 from dataclasses import dataclass
 # importing "heapq" to implement heap queue
 import heapq
+import itertools
 from lib.collection import BottleCollection
+from lib.heuristic import (
+    DEAD_END, ChildHeuristic, Heuristic, child_heuristic, get_heuristic,
+)
 from lib.move import Move
+from lib.packed import PackedPuzzle
+from lib.paths import ROOT, PathTree
+from lib.spill import SpillingDict, SpillingHeap
+from lib.stats import SearchStats
 
 @dataclass
 class State:
@@ -29,91 +37,630 @@ class State:
     def __ne__(self, other: Any) -> bool:
         return not self.__eq__(other)
 
-def dfs(root: BottleCollection) -> Optional[State]:
-    """Perform a depth-first search to find a solution."""
+def _to_moves(path: Tuple[Tuple[int, int, Optional[int]], ...]) -> Tuple[Move, ...]:
+    """Convert the packed (src, dest, score) path of a search to moves."""
+    return tuple(Move(src, dest, score) for src, dest, score in path)
+
+def _dead_end(
+    puzzle: PackedPuzzle,
+    moves: List[Tuple[int, int]],
+    src: int,
+    dest: int,
+    child: bytes,
+) -> bool:
+    """Check if `child`, the state after pouring `src` into `dest` from a
+    state with `moves`, is a dead end, see `PackedPuzzle.is_dead_end`.
+    A move of the parent between two other bottles can still be made in
+    the child, so the child is only checked in full if there is none.
+    """
+    for x, y in moves:
+        if x != src and x != dest and y != src and y != dest:
+            return False
+    return puzzle.is_dead_end(child)
+
+def dfs(
+    root: BottleCollection,
+    max_depth: Optional[int] = None,
+    max_nodes: Optional[int] = None,
+    time_limit: Optional[float] = None,
+    stats: Optional[SearchStats] = None,
+    colour_symmetry: bool = False,
+    prune: bool = False,
+) -> Optional[State]:
+    """Perform a depth-first search to find a solution.
+
+    The search uses an explicit stack so it is not bounded by the recursion
+    limit. States deeper than `max_depth` are not expanded and the search
+    stops once `max_nodes` states have been expanded or `time_limit`
+    seconds have passed. When it is stopped early None is returned and
+    `stats` records which limit was hit and the partial result.
+    With `colour_symmetry` states that only differ by swapping colours are
+    treated as visited. With `prune` dominated moves are skipped and the
+    others are searched best first, see `PackedPuzzle`.
+    """
+    if stats is None:
+        stats = SearchStats()
     # Ensure the search is required
     if root.is_solved:
         return State(root, tuple())
-    visited: List[BottleCollection] = []
-    # Call the recursive function
-    return dfs_recursive(visited, State(root, tuple()))
-
-def dfs_recursive(visited: List[BottleCollection], state: State) -> Optional[State]:
-    col = state.collection
-    #Check if we visited this case or not
-    if col in visited:
-        return None
-    visited.append(col)
-    #If this case is solved, just return the result
-    if col.is_solved:
-        return state
-    #Searching for solution
-    for move in col.get_moves():
-        next_moves = list(state.moves)
-        next_moves.append(move)
-        next_option = State(col.after_moving(move), tuple(next_moves))
-        result = dfs_recursive(visited, next_option)
-        if result is not None:
-            return result
-    # After visiting all possible moves, nothing had a solution
-    return None
-
-def A_star(root: BottleCollection) -> Optional[State]:
-    state: State = State(root, tuple())
-    # h holds partial solutions.
-	# Pop() returns (one of) the solution closest to a solved state.
-    open_set: List[State] = [state]
-    closed_set: List[State] = []
-    heapq.heapify(open_set)
-
-    while len(open_set):
-        base: State = heapq.heappop(open_set)
-        if base.collection.is_solved:
-            return base
-        if base.collection.minRequiredMoves == 0:
+    stats.start()
+    puzzle, start = PackedPuzzle.from_collection(root, colour_symmetry, prune)
+    puzzle, _ = stats.instrument(puzzle)
+    limited = not (max_depth is None and max_nodes is None and time_limit is None)
+    best: Optional[Tuple[int, bytes, int]] = None
+    # Depth each state was first expanded at. With a depth limit a state
+    # reached again in fewer moves has to be expanded again.
+    visited: Dict[bytes, int] = {}
+    paths = PathTree(puzzle.num_bottles)
+    # (state, node of its path in `paths`, depth)
+    stack: List[Tuple[bytes, int, int]] = [(start, ROOT, 0)]
+    result: Optional[State] = None
+    while stack:
+        state, node, depth = stack.pop()
+        key = puzzle.key(state)
+        #Check if we visited this case or not
+        seen = visited.get(key)
+        if seen is not None and (max_depth is None or seen <= depth):
+            stats.duplicates += 1
             continue
+        visited[key] = depth
+        #If this case is solved, just return the result
+        if puzzle.is_solved(state):
+            result = State(puzzle.unpack(state), paths.moves(node))
+            break
+        if max_nodes is not None and stats.nodes_expanded >= max_nodes:
+            stats.stopped_by = "max_nodes"
+            break
+        if time_limit is not None and stats.running_time() >= time_limit:
+            stats.stopped_by = "time_limit"
+            break
+        if limited:
+            remaining = puzzle.min_required_moves(state)
+            if best is None or remaining < best[0]:
+                best = (remaining, state, node)
+        if max_depth is not None and depth >= max_depth:
+            stats.stopped_by = "max_depth"
+            continue
+        moves = puzzle.get_moves(state)
+        stats.expand(depth, len(stack), len(moves))
+        # Push in reverse so the first move is searched first
+        for src, dest in reversed(moves):
+            child = puzzle.after_moving(state, src, dest)
+            if _dead_end(puzzle, moves, src, dest, child):
+                stats.dead_ends += 1
+                continue
+            stack.append((child, paths.add(node, src, dest), depth + 1))
+    if result is None and best is not None:
+        stats.partial = State(puzzle.unpack(best[1]), paths.moves(best[2]), best[0])
+    elif result is not None:
+        stats.stopped_by = None
+    stats.stop()
+    return result
+
+def A_star(
+    root: BottleCollection,
+    colour_symmetry: bool = False,
+    heuristic: Union[str, Heuristic] = "bottom_colours",
+    stats: Optional[SearchStats] = None,
+    memory_budget: Optional[float] = None,
+    prune: bool = False,
+) -> Optional[State]:
+    """Perform an A* search to find a solution with the fewest moves.
+
+    The search runs on the packed states of `PackedPuzzle`, so the fewest
+    moves known to reach each state (its g value) is a dict lookup on the
+    state's key. Instead of updating a state already in the heap, a better
+    path pushes a new entry and the outdated entry is skipped when popped.
+    With `colour_symmetry` states that only differ by swapping colours are
+    treated as the same state. `heuristic` is a function or the name of
+    one in `HEURISTICS`; the solution only has the fewest moves if it is
+    admissible. `stats` is filled in with counters about the search.
+    With `memory_budget` the frontier and the g values are kept to about
+    that many MB of memory and the rest are spilled to temporary files,
+    see `lib.spill`. The paths stay in memory as a compact `PathTree`.
+    With `prune` dominated moves are skipped, see `PackedPuzzle`.
+    """
+    return weighted_A_star(
+        root, 1, colour_symmetry, heuristic, stats, memory_budget, prune
+    )
+
+def weighted_A_star(
+    root: BottleCollection,
+    weight: float = 2,
+    colour_symmetry: bool = False,
+    heuristic: Union[str, Heuristic] = "bottom_colours",
+    stats: Optional[SearchStats] = None,
+    memory_budget: Optional[float] = None,
+    prune: bool = False,
+) -> Optional[State]:
+    """Perform an A* search with the heuristic multiplied by `weight`.
+    With an admissible heuristic the solution is at most `weight` times
+    longer than the shortest one, and is usually found much faster.
+    See `A_star` for the other arguments.
+    """
+    if stats is None:
+        stats = SearchStats()
+    stats.start()
+    if isinstance(heuristic, str):
+        heuristic = get_heuristic(heuristic)
+    puzzle, start = PackedPuzzle.from_collection(root, colour_symmetry, prune)
+    puzzle, timed = stats.instrument(puzzle, heuristic)
+    child_h = child_heuristic(heuristic, timed, stats)
+    heuristic = timed
+    result: Optional[State] = None
+    # The budget is shared evenly by the frontier and the g values
+    budget = None
+    if memory_budget is not None:
+        budget = int(memory_budget * 1024 * 1024 / 2)
+    # Heap entries are (f, -g, counter, state, node of the path in
+    # `paths`). Ties on f are broken
+    # by trying longer solutions first, which leads the algorithm to
+    # "greedily" follow a path before back-tracking to shorter ones.
+    counter = itertools.count()
+    open_set = SpillingHeap(puzzle.size, budget)
+    paths = PathTree(puzzle.num_bottles)
+    open_set.push(
+        (weight * heuristic(puzzle, start), 0, next(counter), start, ROOT)
+    )
+    best_g = SpillingDict(budget)
+    best_g[puzzle.key(start)] = 0
+
+    try:
+        while len(open_set):
+            score, neg_g, _, base, node = open_set.pop()
+            g = -neg_g
+            # A shorter path to this state was found after it was pushed
+            if g > best_g[puzzle.key(base)]:
+                stats.duplicates += 1
+                continue
+            if puzzle.is_solved(base):
+                result = State(puzzle.unpack(base), paths.moves(node), score)
+                break
+            moves = puzzle.get_moves(base)
+            stats.expand(g, len(open_set), len(moves))
+            # The heuristic of `base` from its f score
+            h = round((score - g) / weight)
+
+            for src, dest in moves:
+                next_state = puzzle.after_moving(base, src, dest)
+                if _dead_end(puzzle, moves, src, dest, next_state):
+                    stats.dead_ends += 1
+                    continue
+                key = puzzle.key(next_state)
+                # Only keep this state if it has not been reached in as few moves
+                known = best_g.get(key)
+                if known is not None and known <= g + 1:
+                    stats.duplicates += 1
+                    continue
+                next_h = child_h(puzzle, base, h, src, dest, next_state)
+                if next_h >= DEAD_END:
+                    stats.dead_ends += 1
+                    continue
+                best_g[key] = g + 1
+                #Calculate the f score
+                next_score = weight * next_h + g + 1
+                open_set.push((
+                    next_score, -g - 1, next(counter), next_state,
+                    paths.add(node, src, dest, next_score),
+                ))
+    finally:
+        stats.spilled = open_set.spilled + best_g.spilled
+        open_set.close()
+        best_g.close()
+    stats.stop()
+    return result
 
-        for move in base.collection.get_moves():
-            # If this move is the reverse of the previous move and the move
-            # before that was this move, a loop has been found and needs to
-            # be broken by simply ignoring this move.
-            if (
-                len(base.moves) > 1
-                and base.moves[-1] == move.reverse()
-                and base.moves[-2] == move
-            ):
+def anytime_A_star(
+    root: BottleCollection,
+    weight: float = 3,
+    time_limit: Optional[float] = None,
+    on_solution: Optional[Callable[[State], None]] = None,
+    colour_symmetry: bool = False,
+    heuristic: Union[str, Heuristic] = "bottom_colours",
+    stats: Optional[SearchStats] = None,
+    prune: bool = False,
+) -> Optional[State]:
+    """Perform an anytime weighted A* search, improving on its solution
+    until it is proven to have the fewest moves or `time_limit` seconds
+    have passed.
+
+    States are expanded in the order of `weighted_A_star`, so a first
+    solution comes quickly, but the search goes on after finding one.
+    States that cannot lead to a shorter solution by their unweighted f
+    score are dropped, and once none are left the best solution has the
+    fewest moves if the heuristic is admissible. `on_solution` is called
+    with each solution shorter than the ones before it. The best solution
+    is returned, and `stats.stopped_by` is "time_limit" if it was not
+    proven to be the shortest. See `A_star` for the other arguments.
+    """
+    if stats is None:
+        stats = SearchStats()
+    if root.is_solved:
+        return State(root, tuple())
+    stats.start()
+    if isinstance(heuristic, str):
+        heuristic = get_heuristic(heuristic)
+    puzzle, start = PackedPuzzle.from_collection(root, colour_symmetry, prune)
+    puzzle, timed = stats.instrument(puzzle, heuristic)
+    child_h = child_heuristic(heuristic, timed, stats)
+    heuristic = timed
+    result: Optional[State] = None
+    # Moves of the best solution so far
+    bound = float("inf")
+    # Heap entries are (weighted f, -g, counter, h, state, node of the path
+    # in `paths`), see `weighted_A_star`
+    counter = itertools.count()
+    paths = PathTree(puzzle.num_bottles)
+    h = heuristic(puzzle, start)
+    open_set = [(weight * h, 0, next(counter), h, start, ROOT)]
+    best_g = {puzzle.key(start): 0}
+
+    while open_set:
+        _, neg_g, _, h, base, node = heapq.heappop(open_set)
+        g = -neg_g
+        if g > best_g[puzzle.key(base)]:
+            stats.duplicates += 1
+            continue
+        # A shorter solution was found after this state was pushed
+        if g + h >= bound:
+            continue
+        if puzzle.is_solved(base):
+            bound = g
+            result = State(puzzle.unpack(base), paths.moves(node), g)
+            if on_solution is not None:
+                on_solution(result)
+            continue
+        if time_limit is not None and stats.running_time() >= time_limit:
+            stats.stopped_by = "time_limit"
+            break
+        moves = puzzle.get_moves(base)
+        stats.expand(g, len(open_set), len(moves))
+
+        for src, dest in moves:
+            next_state = puzzle.after_moving(base, src, dest)
+            if _dead_end(puzzle, moves, src, dest, next_state):
+                stats.dead_ends += 1
+                continue
+            key = puzzle.key(next_state)
+            known = best_g.get(key)
+            if known is not None and known <= g + 1:
+                stats.duplicates += 1
+                continue
+            next_h = child_h(puzzle, base, h, src, dest, next_state)
+            if next_h >= DEAD_END:
+                stats.dead_ends += 1
                 continue
-            #Create a new State
-            next_moves = list(base.moves)
-            next_moves.append(move)
-            next_state: State = State(base.collection.after_moving(move), tuple(next_moves))
-            #Calculate the f score
-            minRequiredMoves = next_state.collection.minRequiredMoves()
-            next_state.score = minRequiredMoves + len(next_state.moves)
-            next_state.moves[-1].score = next_state.score
-            #Check if this state has been visited or not
-            if next_state not in open_set and next_state not in closed_set:
-                #Add a new state to open set
-                heapq.heappush(open_set, next_state)
+            if g + 1 + next_h >= bound:
+                continue
+            best_g[key] = g + 1
+            next_score = weight * next_h + g + 1
+            heapq.heappush(open_set, (
+                next_score, -g - 1, next(counter), next_h, next_state,
+                paths.add(node, src, dest, next_score),
+            ))
+    stats.stop()
+    return result
+
+def ida_star(
+    root: BottleCollection,
+    colour_symmetry: bool = False,
+    heuristic: Union[str, Heuristic] = "bottom_colours",
+    stats: Optional[SearchStats] = None,
+    prune: bool = False,
+) -> Optional[State]:
+    """Perform an iterative deepening A* search.
+
+    Each iteration is a depth-first search that skips states whose f score
+    is above a bound, starting from the root's heuristic and raised to the
+    smallest f score skipped. Each iteration keeps the fewest moves every
+    state was reached in and skips states reached again in as many moves
+    or more, as their subtree was already searched within the bound. This
+    trades the memory linear in the depth of plain IDA* for not searching
+    the states reached by many paths over and over. With an admissible
+    heuristic the solution has the fewest moves. See `A_star` for the
+    arguments.
+    """
+    if stats is None:
+        stats = SearchStats()
+    stats.start()
+    if isinstance(heuristic, str):
+        heuristic = get_heuristic(heuristic)
+    puzzle, start = PackedPuzzle.from_collection(root, colour_symmetry, prune)
+    puzzle, timed = stats.instrument(puzzle, heuristic)
+    child_h = child_heuristic(heuristic, timed, stats)
+    result: Optional[State] = None
+    start_h = timed(puzzle, start)
+    bound: Optional[int] = start_h
+    if puzzle.is_solved(start):
+        result = State(root, tuple(), 0)
+        bound = None
+    while bound is not None and result is None:
+        result, bound = _ida_pass(puzzle, child_h, start, start_h, bound, stats)
+    stats.stop()
+    return result
+
+def _ida_pass(
+    puzzle: PackedPuzzle,
+    child_h: ChildHeuristic,
+    start: bytes,
+    start_h: int,
+    bound: int,
+    stats: SearchStats,
+) -> Tuple[Optional[State], Optional[int]]:
+    """Search for a solution within `bound` for `ida_star`, `start_h`
+    being the heuristic of `start`.
+    Returns the solution if found, otherwise the next bound to try or None
+    if nothing was skipped.
+    """
+    next_bound: Optional[int] = None
+    # The current path and the children left to try for each state on it,
+    # best first
+    path: List[Tuple[bytes, Tuple[int, int, Optional[int]]]] = [
+        (start, (-1, -1, None))
+    ]
+    # Fewest moves each state was reached in during this pass, which also
+    # avoids cycles as the states on the path are reached in fewer moves
+    reached = {puzzle.key(start): 0}
+    children = _ordered_children(puzzle, child_h, start, 0, start_h, stats)
+    stats.expand(0, 1, len(children))
+    stack = [iter(children)]
+    while stack:
+        child = next(stack[-1], None)
+        if child is None:
+            stack.pop()
+            path.pop()
+            continue
+        score, src, dest, state = child
+        if score > bound:
+            if next_bound is None or score < next_bound:
+                next_bound = score
+            continue
+        key = puzzle.key(state)
+        g = len(path)
+        known = reached.get(key)
+        if known is not None and known <= g:
+            stats.duplicates += 1
+            continue
+        reached[key] = g
+        path.append((state, (src, dest, score)))
+        if puzzle.is_solved(state):
+            moves = _to_moves(tuple(move for _, move in path[1:]))
+            return State(puzzle.unpack(state), moves, score), None
+        children = _ordered_children(puzzle, child_h, state, g, score - g, stats)
+        stats.expand(len(path) - 1, len(path), len(children))
+        stack.append(iter(children))
+    return None, next_bound
+
+def _ordered_children(
+    puzzle: PackedPuzzle,
+    child_h: ChildHeuristic,
+    state: bytes,
+    g: int,
+    h: int,
+    stats: SearchStats,
+) -> List[Tuple[int, int, int, bytes]]:
+    """Get the (f, src, dest, child) of each move from `state`, reached in
+    `g` moves with the heuristic `h`, best first. Dead ends are left out.
+    """
+    children = []
+    moves = puzzle.get_moves(state)
+    for src, dest in moves:
+        child = puzzle.after_moving(state, src, dest)
+        if _dead_end(puzzle, moves, src, dest, child):
+            stats.dead_ends += 1
+            continue
+        next_h = child_h(puzzle, state, h, src, dest, child)
+        if next_h >= DEAD_END:
+            stats.dead_ends += 1
+            continue
+        children.append((g + 1 + next_h, src, dest, child))
+    children.sort(key=lambda child: child[0])
+    return children
+
+def beam_search(
+    root: BottleCollection,
+    width: int = 100,
+    colour_symmetry: bool = False,
+    heuristic: Union[str, Heuristic] = "bottom_colours",
+    stats: Optional[SearchStats] = None,
+    prune: bool = False,
+) -> Optional[State]:
+    """Perform a beam search that keeps the best `width` states per depth.
+
+    The states at each depth are expanded together and only the `width`
+    children with the lowest heuristic are kept for the next depth, so the
+    time per depth is bounded. Solutions are not guaranteed to be the
+    shortest and a solvable puzzle may not be solved if the beam is too
+    narrow. See `A_star` for the other arguments.
+    """
+    if stats is None:
+        stats = SearchStats()
+    stats.start()
+    if isinstance(heuristic, str):
+        heuristic = get_heuristic(heuristic)
+    puzzle, start = PackedPuzzle.from_collection(root, colour_symmetry, prune)
+    puzzle, timed = stats.instrument(puzzle, heuristic)
+    child_h = child_heuristic(heuristic, timed, stats)
+    seen = {puzzle.key(start)}
+    paths = PathTree(puzzle.num_bottles)
+    # The heuristic, state and node of its path in `paths` of the states
+    # at `depth`
+    layer: List[Tuple[int, bytes, int]] = [(timed(puzzle, start), start, ROOT)]
+    depth = 0
+    result: Optional[State] = None
+    while layer and result is None:
+        children: List[Tuple[int, int, bytes, int]] = []
+        for h, state, node in layer:
+            if puzzle.is_solved(state):
+                result = State(puzzle.unpack(state), paths.moves(node), depth)
+                break
+            moves = puzzle.get_moves(state)
+            stats.expand(depth, len(layer) + len(children), len(moves))
+            for src, dest in moves:
+                child = puzzle.after_moving(state, src, dest)
+                if _dead_end(puzzle, moves, src, dest, child):
+                    stats.dead_ends += 1
+                    continue
+                key = puzzle.key(child)
+                if key in seen:
+                    stats.duplicates += 1
+                    continue
+                seen.add(key)
+                score = child_h(puzzle, state, h, src, dest, child)
+                if score >= DEAD_END:
+                    stats.dead_ends += 1
+                    continue
+                children.append((
+                    score, len(children), child,
+                    paths.add(node, src, dest, score + depth + 1),
+                ))
+        layer = [
+            (score, child, node)
+            for score, _, child, node in heapq.nsmallest(width, children)
+        ]
+        depth += 1
+    stats.stop()
+    return result
+
+def batched_beam_search(
+    root: BottleCollection,
+    width: int = 100,
+    stats: Optional[SearchStats] = None,
+) -> Optional[State]:
+    """Perform `beam_search` with NumPy on whole depths at once, see
+    `lib.batched`. NumPy is only imported when this is called.
+    """
+    from lib import batched
+    return batched.batched_beam_search(root, width, stats)
+
+def bidirectional(
+    root: BottleCollection, stats: Optional[SearchStats] = None
+) -> Optional[State]:
+    """Perform a breadth-first search from both the root and the goal.
+
+    The goal is the solved state where each colour fills whole bottles,
+    which is unique once the order of the bottles is ignored. Its side of
+    the search pours items back with `PackedPuzzle.predecessors`. Each
+    step expands a whole depth of the smaller side until the two sides
+    reach a common key, so the solution has the fewest moves while each
+    side only goes about half as deep.
+    """
+    if stats is None:
+        stats = SearchStats()
+    if root.is_solved:
+        return State(root, tuple(), 0)
+    stats.start()
+    puzzle, start = PackedPuzzle.from_collection(root)
+    puzzle, _ = stats.instrument(puzzle)
+    goal = puzzle.goal(start)
+    # Key -> (state, parent's key, src, dest) of the states reached
+    # forward, and key -> (next key towards the goal, moves to the goal) of
+    # those reached backward. Backward states are stored as their keys.
+    forward: Dict[bytes, Tuple[bytes, Optional[bytes], int, int]] = {
+        puzzle.key(start): (start, None, -1, -1)
+    }
+    backward: Dict[bytes, Tuple[Optional[bytes], int]] = {}
+    if goal is not None:
+        backward[goal] = (None, 0)
+    forward_layer = [start]
+    backward_layer = list(backward)
+    depth = [0, 0]
+    meet: Optional[Tuple[int, bytes]] = None
+    while forward_layer and backward_layer and meet is None:
+        if len(forward_layer) <= len(backward_layer):
+            layer: List[bytes] = []
+            for state in forward_layer:
+                moves = puzzle.get_moves(state)
+                frontier = len(forward_layer) + len(backward_layer)
+                stats.expand(depth[0], frontier, len(moves))
+                parent = puzzle.key(state)
+                for src, dest in moves:
+                    child = puzzle.after_moving(state, src, dest)
+                    if _dead_end(puzzle, moves, src, dest, child):
+                        stats.dead_ends += 1
+                        continue
+                    key = puzzle.key(child)
+                    if key in forward:
+                        stats.duplicates += 1
+                        continue
+                    forward[key] = (child, parent, src, dest)
+                    layer.append(child)
+                    if key in backward:
+                        length = depth[0] + 1 + backward[key][1]
+                        if meet is None or length < meet[0]:
+                            meet = (length, key)
+            forward_layer = layer
+            depth[0] += 1
+        else:
+            layer = []
+            for state in backward_layer:
+                parents = puzzle.predecessors(state)
+                frontier = len(forward_layer) + len(backward_layer)
+                stats.expand(depth[1], frontier, len(parents))
+                for parent in parents:
+                    key = puzzle.key(parent)
+                    if key in backward:
+                        stats.duplicates += 1
+                        continue
+                    backward[key] = (state, depth[1] + 1)
+                    layer.append(key)
+                    if key in forward:
+                        length = depth[1] + 1 + len(_forward_path(forward, key))
+                        if meet is None or length < meet[0]:
+                            meet = (length, key)
+            backward_layer = layer
+            depth[1] += 1
+    result = None
+    if meet is not None:
+        path = _forward_path(forward, meet[1])
+        state = forward[meet[1]][0]
+        after, _ = backward[meet[1]]
+        # Replay the backward half on the forward state to find the
+        # positions of the bottles it pours between
+        while after is not None:
+            for src, dest in puzzle.get_moves(state):
+                child = puzzle.after_moving(state, src, dest)
+                if puzzle.key(child) == after:
+                    break
             else:
-                #Check if g value of this state when visit it through the base state
-                #is better than the current g value
-                #If yes, we have to visit it again through the base state
-                if next_state in open_set:
-                    visited: State = open_set[open_set.index(next_state)]
-                    if len(visited.moves) > len(next_state.moves):
-                        visited.moves = next_state.moves
-                        visited.score = visited.collection.minRequiredMoves() + len(visited.moves)
-                if next_state in closed_set:
-                    visited: State = closed_set[closed_set.index(next_state)]
-                    if len(visited.moves) > len(next_state.moves):
-                        visited.moves = next_state.moves
-                        visited.score = visited.collection.minRequiredMoves() + len(visited.moves)
-                        #Add this visited state to open set and remove it from closed set 
-                        heapq.heappush(open_set, visited)
-                        closed_set.remove(visited)
-        #Add the visited state to closed set
-        closed_set.append(base)
-            #This use to print the current heap when debug
-            #print(open_set, "\n")
-    return None
\ No newline at end of file
+                raise ValueError("No move to the next backward state", after)
+            path.append((src, dest, None))
+            state = child
+            after, _ = backward[after]
+        result = State(puzzle.unpack(state), _to_moves(tuple(path)), len(path))
+    stats.stop()
+    return result
+
+def _forward_path(
+    forward: Dict[bytes, Tuple[bytes, Optional[bytes], int, int]], key: bytes
+) -> List[Tuple[int, int, Optional[int]]]:
+    """Get the moves from the root to `key` for `bidirectional`."""
+    path: List[Tuple[int, int, Optional[int]]] = []
+    _, parent, src, dest = forward[key]
+    while parent is not None:
+        path.append((src, dest, None))
+        _, parent, src, dest = forward[parent]
+    path.reverse()
+    return path
+
+Solver = Callable[..., Optional[State]]
+
+# Solvers by name, each taking the collection to solve and keyword options
+SOLVERS: Dict[str, Solver] = {
+    "dfs": dfs,
+    "A_star": A_star,
+    "weighted_A_star": weighted_A_star,
+    "anytime_A_star": anytime_A_star,
+    "ida_star": ida_star,
+    "beam_search": beam_search,
+    "batched_beam_search": batched_beam_search,
+    "bidirectional": bidirectional,
+}
+
+def solve(root: BottleCollection, algorithm: str, **options: Any) -> Optional[State]:
+    """Solve `root` with the solver registered as `algorithm`."""
+    try:
+        solver = SOLVERS[algorithm]
+    except KeyError:
+        raise ValueError("Unknown algorithm", algorithm) from None
+    return solver(root, **options)
@@ -0,0 +1,282 @@
+"""Long running solver service reading puzzles as lines of JSON on a socket.
+
+Each request is a JSON object on one line, holding the puzzle in the
+format of `json2collection.load` and optionally the algorithm, its
+options, a deadline in seconds and a progress interval in seconds:
+
+    {"id": 1, "puzzle": [["RED", "BLUE"], ...], "algorithm": "A_star",
+     "options": {"heuristic": "lookahead"}, "deadline": 5, "progress": 1}
+
+Every reply is a JSON object on one line with the `id` of its request. A
+request gets "progress" replies while it is being solved if it asked for
+them, then one "result" reply, or an "error" reply if it was refused.
+Solvers in `ANYTIME` also send a "solution" reply for each solution
+shorter than the ones before, and on reaching the deadline give the
+best solution found as their result instead of timing out.
+"""
+import asyncio
+import json
+import multiprocessing
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Dict, Optional, Tuple
+
+from lib.batch import PuzzleTimeout, default_jobs, time_limit
+from lib.collection import BottleCollection
+from lib.search import SOLVERS, State, solve
+from lib.stats import SearchStats
+from lib.validate import check, check_data
+
+# Solvers improving on their solution until a `time_limit`
+ANYTIME = {"anytime_A_star"}
+
+# Queue of the replies sent before a result, set in each worker by
+# `_init_worker`
+_progress: Any = None
+
+def _init_worker(progress: Any) -> None:
+    """Keep the queue replies before a result are sent to in a new worker."""
+    global _progress
+    _progress = progress
+
+def _send(ticket: int, reply: Dict[str, Any]) -> None:
+    """Send a reply to the request `ticket` before its result."""
+    _progress.put((ticket, reply))
+
+def _describe(result: State) -> Dict[str, Any]:
+    """Describe the moves of a solution in a reply."""
+    return {
+        "moves": [[move.src, move.dest] for move in result.moves],
+        "length": len(result.moves),
+    }
+
+def _solve(
+    ticket: int,
+    puzzle: Any,
+    algorithm: str,
+    options: Dict[str, Any],
+    end_time: Optional[float],
+    progress_interval: Optional[float],
+) -> Dict[str, Any]:
+    """Solve a puzzle in a worker and describe the outcome as a reply."""
+    reply: Dict[str, Any] = {"type": "result"}
+    stats = SearchStats()
+    if progress_interval is not None:
+        stats.progress = lambda stats: _send(
+            ticket, {"type": "progress", "stats": stats.as_dict()}
+        )
+        stats.progress_interval = progress_interval
+    if algorithm in ANYTIME:
+        options = dict(options, on_solution=lambda result: _send(
+            ticket, {"type": "solution", **_describe(result)}
+        ))
+    start_time = time.perf_counter()
+    try:
+        timeout = None if end_time is None else end_time - time.time()
+        if timeout is not None and timeout <= 0:
+            raise PuzzleTimeout()
+        if algorithm in ANYTIME and timeout is not None:
+            options["time_limit"] = timeout
+            timeout = None
+        with time_limit(timeout):
+            check_data(puzzle)
+            root = BottleCollection(puzzle)
+            check(root)
+            result = solve(root, algorithm, stats=stats, **options)
+    except PuzzleTimeout:
+        result = None
+        reply["error"] = "timeout"
+    except MemoryError:
+        result = None
+        reply["error"] = "memory"
+    except (ValueError, KeyError, TypeError) as err:
+        result = None
+        reply["error"] = f"{err.__class__.__name__}: {err}"
+    reply["time"] = time.perf_counter() - start_time
+    reply["solved"] = result is not None
+    if result is not None:
+        reply.update(_describe(result))
+    reply["stats"] = stats.as_dict()
+    return reply
+
+class SolveServer:
+    """Serves solve requests on a pool of `jobs` warm worker processes.
+
+    At most `queue_size` requests wait for a worker, further requests are
+    refused until one finishes. Requests without a deadline get
+    `deadline` seconds, counting the time spent waiting. If a worker dies,
+    e.g. killed by the OOM killer, the requests on the pool get an error
+    and a new pool is started.
+    """
+    def __init__(
+        self,
+        jobs: Optional[int] = None,
+        queue_size: int = 64,
+        deadline: Optional[float] = None,
+        algorithm: str = "A_star",
+    ):
+        """Start the worker processes."""
+        self.jobs = jobs or default_jobs()
+        self.queue_size = queue_size
+        self.deadline = deadline
+        self.algorithm = algorithm
+        self.__context = multiprocessing.get_context()
+        self.__progress = self.__context.Queue()
+        self.__pool = self.__start_pool()
+        self.__pending = 0
+        self.__tickets = 0
+        # Ticket -> (request id, connection) of each request being solved
+        self.__requests: Dict[int, Tuple[Any, asyncio.StreamWriter]] = {}
+        self.__loop: Optional[asyncio.AbstractEventLoop] = None
+
+    async def serve_unix(self, path: str) -> None:
+        """Serve connections on the Unix socket `path` until cancelled."""
+        server = await asyncio.start_unix_server(self.handle, path)
+        await self.__serve(server)
+
+    async def serve_tcp(self, host: str, port: int) -> None:
+        """Serve connections on `host`:`port` until cancelled."""
+        server = await asyncio.start_server(self.handle, host, port)
+        await self.__serve(server)
+
+    async def __serve(self, server: asyncio.AbstractServer) -> None:
+        """Forward progress while `server` runs."""
+        self.__loop = asyncio.get_running_loop()
+        forwarder = threading.Thread(target=self.__forward_progress, daemon=True)
+        forwarder.start()
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            self.__progress.put(None)
+
+    def __forward_progress(self) -> None:
+        """Pass the progress replies of the workers to the event loop."""
+        while True:
+            message = self.__progress.get()
+            if message is None:
+                return
+            self.__loop.call_soon_threadsafe(self.__reply_progress, *message)
+
+    def __reply_progress(self, ticket: int, reply: Dict[str, Any]) -> None:
+        """Send a progress reply if its request is still being solved."""
+        request = self.__requests.get(ticket)
+        if request is not None:
+            request_id, writer = request
+            _write(writer, request_id, reply)
+
+    async def handle(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        """Answer the requests of one connection until it is closed."""
+        tasks = set()
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                if not line.strip():
+                    continue
+                task = asyncio.ensure_future(self.__answer(line, writer))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+            if tasks:
+                await asyncio.wait(tasks)
+        finally:
+            writer.close()
+
+    async def __answer(self, line: bytes, writer: asyncio.StreamWriter) -> None:
+        """Solve the request in `line` and send the replies."""
+        request_id = None
+        try:
+            request = json.loads(line)
+            if not isinstance(request, dict):
+                raise ValueError("A request must be an object")
+            request_id = request.get("id")
+            algorithm = request.get("algorithm", self.algorithm)
+            if algorithm not in SOLVERS:
+                raise ValueError(f"Unknown algorithm: {algorithm}")
+            options = request.get("options", {})
+            if not isinstance(options, dict):
+                raise ValueError("options must be an object")
+            deadline = _seconds(request.get("deadline", self.deadline), "deadline")
+            progress = _seconds(request.get("progress"), "progress")
+            puzzle = request["puzzle"]
+        except (ValueError, KeyError) as err:
+            _write(writer, request_id, {"type": "error", "error": f"Invalid request: {err}"})
+            await writer.drain()
+            return
+        if self.__pending >= self.jobs + self.queue_size:
+            _write(writer, request_id, {"type": "error", "error": "busy"})
+            await writer.drain()
+            return
+        self.__pending += 1
+        self.__tickets += 1
+        ticket = self.__tickets
+        self.__requests[ticket] = (request_id, writer)
+        try:
+            end_time = None if deadline is None else time.time() + deadline
+            reply = await self.__run(
+                _solve, ticket, puzzle, algorithm, options, end_time, progress
+            )
+        except BrokenProcessPool:
+            reply = {"type": "result", "solved": False, "error": "worker died"}
+        except Exception as err:
+            # `_solve` reports the errors of the puzzle itself, anything
+            # else still has to be answered
+            reply = {
+                "type": "result", "solved": False,
+                "error": f"{err.__class__.__name__}: {err}",
+            }
+        finally:
+            self.__pending -= 1
+            del self.__requests[ticket]
+        _write(writer, request_id, reply)
+        await writer.drain()
+
+    def __start_pool(self) -> ProcessPoolExecutor:
+        """Start `jobs` worker processes."""
+        return ProcessPoolExecutor(
+            self.jobs,
+            mp_context=self.__context,
+            initializer=_init_worker,
+            initargs=(self.__progress,),
+        )
+
+    async def __run(self, function: Any, *args: Any) -> Any:
+        """Run `function` on the pool and get its result."""
+        pool = self.__pool
+        try:
+            return await asyncio.wrap_future(pool.submit(function, *args))
+        except BrokenProcessPool:
+            # A dead worker fails every job of its pool, so start a new
+            # one for the requests to come unless another job already did
+            if self.__pool is pool:
+                pool.shutdown(wait=False, cancel_futures=True)
+                self.__pool = self.__start_pool()
+            raise
+
+    def close(self) -> None:
+        """Stop the worker processes."""
+        self.__pool.shutdown(wait=False, cancel_futures=True)
+        for worker in multiprocessing.active_children():
+            worker.terminate()
+            worker.join()
+
+def _seconds(value: Any, name: str) -> Optional[float]:
+    """Check the `name` field of a request is a positive number of seconds
+    or None.
+    """
+    if value is None:
+        return None
+    if isinstance(value, bool) or not isinstance(value, (int, float)) or not value > 0:
+        raise ValueError(f"{name} must be a positive number of seconds")
+    return float(value)
+
+def _write(writer: asyncio.StreamWriter, request_id: Any, reply: Dict[str, Any]) -> None:
+    """Send `reply` to the request `request_id` as a line of JSON."""
+    if writer.is_closing():
+        return
+    writer.write(json.dumps({"id": request_id, **reply}).encode() + b"\n")
@@ -0,0 +1,203 @@
+"""Search frontiers and visited sets that spill to disk past a memory budget.
+`sqlite3` and `tempfile` are only imported once something is spilled.
+"""
+from __future__ import annotations
+import heapq
+import os
+import struct
+import sys
+from typing import TYPE_CHECKING, BinaryIO, Dict, Iterator, List, Optional, Tuple
+
+from lib.paths import from_double
+
+if TYPE_CHECKING:
+    import sqlite3
+    import tempfile
+
+# (f, -g, counter, state, node of its path in a `PathTree`) as pushed by
+# the A* solvers
+Entry = Tuple[float, int, int, bytes, int]
+
+# f, -g, counter and node of a spilled entry, followed by its state
+_HEADER = struct.Struct("<dqqq")
+
+# Rough bytes used by a dict slot and the int it holds on top of the key
+_SLOT_SIZE = 100
+
+def _entry_size(entry: Entry) -> int:
+    """Estimate the memory held by an entry of `SpillingHeap`."""
+    return (
+        sys.getsizeof(entry) + sys.getsizeof(entry[0])
+        + sys.getsizeof(entry[3]) + sys.getsizeof(entry[4])
+    )
+
+def _read_run(run: BinaryIO, state_size: int) -> Iterator[Entry]:
+    """Read back the entries written by `SpillingHeap` in their order."""
+    run.seek(0)
+    while True:
+        header = run.read(_HEADER.size)
+        if not header:
+            return
+        f, neg_g, counter, node = _HEADER.unpack(header)
+        yield from_double(f), neg_g, counter, run.read(state_size), node  # type: ignore
+
+class SpillingHeap:
+    """Priority queue of search entries keeping at most about `budget`
+    bytes of them in memory.
+
+    When the budget is passed, the worst half of the entries in memory is
+    written to a temporary file in sorted order. Popping merges these runs
+    with the heap in memory, so entries still come out in order. Without a
+    budget this is a plain heap.
+    """
+    def __init__(
+        self,
+        state_size: int,
+        budget: Optional[int] = None,
+        directory: Optional[str] = None,
+    ):
+        """Create an empty queue of entries with `state_size` byte states.
+        Spilled entries go to temporary files in `directory`.
+        """
+        self.heap: List[Entry] = []
+        self.budget = budget
+        self.memory = 0
+        self.spilled = 0
+        self.directory = directory
+        self.__state_size = state_size
+        self.__length = 0
+        # (first entry, run number, rest of the entries) of each run
+        self.__runs: List[Tuple[Entry, int, Iterator[Entry]]] = []
+        self.__files: List[BinaryIO] = []
+
+    def push(self, entry: Entry) -> None:
+        """Add `entry`, spilling if it takes the queue over budget."""
+        heapq.heappush(self.heap, entry)
+        self.__length += 1
+        if self.budget is not None:
+            self.memory += _entry_size(entry)
+            if self.memory > self.budget:
+                self.__spill()
+
+    def pop(self) -> Entry:
+        """Remove and get the smallest entry."""
+        self.__length -= 1
+        if self.__runs and (not self.heap or self.__runs[0][0] < self.heap[0]):
+            entry, run, rest = self.__runs[0]
+            following = next(rest, None)
+            if following is None:
+                heapq.heappop(self.__runs)
+            else:
+                heapq.heapreplace(self.__runs, (following, run, rest))
+            return entry
+        entry = heapq.heappop(self.heap)
+        if self.budget is not None:
+            self.memory -= _entry_size(entry)
+        return entry
+
+    def __spill(self) -> None:
+        """Write the worst half of the entries in memory to a new run."""
+        entries = sorted(self.heap)
+        keep = len(entries) // 2
+        # A sorted list is already a heap
+        self.heap = entries[:keep]
+        self.memory = sum(_entry_size(entry) for entry in self.heap)
+        import tempfile
+        run = tempfile.TemporaryFile(dir=self.directory)
+        for f, neg_g, counter, state, node in entries[keep:]:
+            run.write(_HEADER.pack(f, neg_g, counter, node))
+            run.write(state)
+        self.spilled += len(entries) - keep
+        self.__files.append(run)
+        rest = _read_run(run, self.__state_size)
+        heapq.heappush(self.__runs, (next(rest), len(self.__files), rest))
+
+    def close(self) -> None:
+        """Remove the spilled runs."""
+        for run in self.__files:
+            run.close()
+        self.__files = []
+        self.__runs = []
+
+    def __len__(self) -> int:
+        """Get the number of entries in memory and on disk."""
+        return self.__length
+
+class SpillingDict:
+    """Map of state keys to ints keeping at most about `budget` bytes of
+    them in memory.
+
+    When the budget is passed, the oldest half of the entries in memory is
+    moved to a temporary SQLite file, which is looked in for keys that are
+    not in memory. Without a budget this is a plain dict.
+    """
+    def __init__(self, budget: Optional[int] = None, directory: Optional[str] = None):
+        """Create an empty map spilling to a file in `directory`."""
+        self.data: Dict[bytes, int] = {}
+        self.budget = budget
+        self.memory = 0
+        self.spilled = 0
+        self.directory = directory
+        self.__temp: Optional[tempfile.TemporaryDirectory] = None
+        self.__db: Optional[sqlite3.Connection] = None
+
+    def get(self, key: bytes, default: Optional[int] = None) -> Optional[int]:
+        """Get the value of `key` or `default` if it has none."""
+        value = self.data.get(key)
+        if value is None and self.__db is not None:
+            row = self.__db.execute(
+                "SELECT value FROM spilled WHERE key = ?", (key,)
+            ).fetchone()
+            if row is not None:
+                value = row[0]
+        return default if value is None else value
+
+    def __getitem__(self, key: bytes) -> int:
+        """Get the value of `key`."""
+        value = self.get(key)
+        if value is None:
+            raise KeyError(key)
+        return value
+
+    def __contains__(self, key: object) -> bool:
+        """Check if `key` has a value."""
+        return isinstance(key, bytes) and self.get(key) is not None
+
+    def __setitem__(self, key: bytes, value: int) -> None:
+        """Set the value of `key`, spilling if that goes over budget."""
+        if self.budget is not None and key not in self.data:
+            self.memory += sys.getsizeof(key) + _SLOT_SIZE
+        # A value in memory hides any spilled one until it is spilled too
+        self.data[key] = value
+        if self.budget is not None and self.memory > self.budget:
+            self.__spill()
+
+    def __spill(self) -> None:
+        """Move the oldest half of the entries in memory to disk."""
+        if self.__db is None:
+            import sqlite3
+            import tempfile
+            self.__temp = tempfile.TemporaryDirectory(dir=self.directory)
+            self.__db = sqlite3.connect(os.path.join(self.__temp.name, "spilled.sqlite3"))
+            self.__db.execute("PRAGMA journal_mode = OFF")
+            self.__db.execute("PRAGMA synchronous = OFF")
+            self.__db.execute(
+                "CREATE TABLE spilled (key BLOB PRIMARY KEY, value INTEGER) WITHOUT ROWID"
+            )
+        items = list(self.data.items())
+        half = len(items) // 2
+        self.__db.executemany(
+            "INSERT OR REPLACE INTO spilled VALUES (?, ?)", items[:half]
+        )
+        self.data = dict(items[half:])
+        self.memory = sum(sys.getsizeof(key) + _SLOT_SIZE for key in self.data)
+        self.spilled += half
+
+    def close(self) -> None:
+        """Remove the spilled entries."""
+        if self.__db is not None:
+            self.__db.close()
+            self.__db = None
+        if self.__temp is not None:
+            self.__temp.cleanup()
+            self.__temp = None
@@ -0,0 +1,210 @@
+"""Counters and timers describing how a search went."""
+from __future__ import annotations
+import threading
+import time
+from dataclasses import dataclass, field, fields
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional, Tuple
+
+from lib.packed import PackedPuzzle
+
+if TYPE_CHECKING:
+    from lib.heuristic import Heuristic
+    from lib.search import State
+
+# The phases of a search that are timed when `SearchStats.timing` is set
+PHASES = ("moves", "apply", "heuristic", "dedupe")
+
+@dataclass
+class SearchStats:
+    """Counters describing how a search went.
+
+    Solvers fill these in as they go. Set `timing` to also record the time
+    spent in each of `PHASES`, `progress` to be called with the stats every
+    `progress_interval` seconds and `memory_interval` to sample the memory
+    used every that many seconds into `peak_memory`.
+    """
+    nodes_expanded: int = 0
+    nodes_generated: int = 0
+    # Generated states dropped because they had already been reached
+    duplicates: int = 0
+    max_frontier: int = 0
+    max_depth: int = 0
+    # Generated states dropped as the heuristic found they cannot be solved
+    dead_ends: int = 0
+    # Frontier and visited entries moved to disk to stay in a memory budget
+    spilled: int = 0
+    elapsed: float = 0.0
+    # Highest resident memory seen while searching in bytes
+    peak_memory: Optional[int] = None
+    phase_times: Dict[str, float] = field(default_factory=dict)
+    # Name of the limit that stopped the search early, if any
+    stopped_by: Optional[str] = None
+    # The closest state to a solution seen before the search was stopped
+    partial: Optional[State] = None
+    timing: bool = False
+    progress: Optional[Callable[[SearchStats], None]] = None
+    progress_interval: float = 1.0
+    memory_interval: Optional[float] = None
+    _start_time: float = field(default=0.0, repr=False)
+    _next_progress: float = field(default=0.0, repr=False)
+    _sampler: Optional[MemorySampler] = field(default=None, repr=False)
+
+    @property
+    def branching(self) -> float:
+        """Average number of moves generated per expanded state."""
+        if self.nodes_expanded == 0:
+            return 0.0
+        return self.nodes_generated / self.nodes_expanded
+
+    def start(self) -> None:
+        """Start timing a search."""
+        self._start_time = time.perf_counter()
+        self._next_progress = self._start_time + self.progress_interval
+        if self.memory_interval is not None:
+            self._sampler = MemorySampler(self, self.memory_interval)
+            self._sampler.start()
+
+    def running_time(self) -> float:
+        """Get the seconds since `start` was called."""
+        return time.perf_counter() - self._start_time
+
+    def stop(self) -> None:
+        """Stop timing a search started with `start`."""
+        self.elapsed = time.perf_counter() - self._start_time
+        if self._sampler is not None:
+            self._sampler.stop()
+            self._sampler = None
+
+    def expand(self, depth: int, frontier: int, moves: int, count: int = 1) -> None:
+        """Record `count` states at `depth` being expanded into `moves`
+        children while `frontier` states are waiting to be expanded.
+        """
+        self.nodes_expanded += count
+        self.nodes_generated += moves
+        if depth > self.max_depth:
+            self.max_depth = depth
+        if frontier > self.max_frontier:
+            self.max_frontier = frontier
+        if self.progress is not None:
+            now = time.perf_counter()
+            if now >= self._next_progress:
+                self.elapsed = now - self._start_time
+                self._next_progress = now + self.progress_interval
+                self.progress(self)
+
+    def instrument(
+        self, puzzle: PackedPuzzle, heuristic: Optional[Heuristic] = None
+    ) -> Tuple[PackedPuzzle, Optional[Heuristic]]:
+        """Wrap `puzzle` and `heuristic` to time their phases if `timing`."""
+        if not self.timing:
+            return puzzle, heuristic
+        for phase in PHASES:
+            self.phase_times.setdefault(phase, 0.0)
+        timed = TimedPuzzle(puzzle, self.phase_times)
+        if heuristic is None:
+            return timed, None  # type: ignore
+
+        def timed_heuristic(puzzle: PackedPuzzle, state: bytes) -> int:
+            start = time.perf_counter()
+            ret = heuristic(timed.puzzle, state)
+            self.phase_times["heuristic"] += time.perf_counter() - start
+            return ret
+        return timed, timed_heuristic  # type: ignore
+
+    def as_dict(self) -> Dict[str, Any]:
+        """Get the counters as a dict that can be written as JSON."""
+        ret: Dict[str, Any] = {
+            item.name: getattr(self, item.name)
+            for item in fields(self)
+            if item.name in _REPORTED
+        }
+        ret["branching"] = self.branching
+        return ret
+
+_REPORTED = (
+    "nodes_expanded", "nodes_generated", "duplicates", "dead_ends",
+    "max_frontier", "max_depth", "spilled", "elapsed", "peak_memory", "phase_times", "stopped_by",
+)
+
+class TimedPuzzle:
+    """Wraps a `PackedPuzzle` adding the time spent in it to `times`."""
+    def __init__(self, puzzle: PackedPuzzle, times: Dict[str, float]):
+        """Time the methods of `puzzle`."""
+        self.puzzle = puzzle
+        self.times = times
+
+    def get_moves(self, state: bytes) -> List[Tuple[int, int]]:
+        """Timed `PackedPuzzle.get_moves`."""
+        start = time.perf_counter()
+        ret = self.puzzle.get_moves(state)
+        self.times["moves"] += time.perf_counter() - start
+        return ret
+
+    def after_moving(self, state: bytes, src: int, dest: int) -> bytes:
+        """Timed `PackedPuzzle.after_moving`."""
+        start = time.perf_counter()
+        ret = self.puzzle.after_moving(state, src, dest)
+        self.times["apply"] += time.perf_counter() - start
+        return ret
+
+    def key(self, state: bytes) -> bytes:
+        """Timed `PackedPuzzle.key`."""
+        start = time.perf_counter()
+        ret = self.puzzle.key(state)
+        self.times["dedupe"] += time.perf_counter() - start
+        return ret
+
+    def is_dead_end(self, state: bytes) -> bool:
+        """Timed `PackedPuzzle.is_dead_end`, part of finding the moves."""
+        start = time.perf_counter()
+        ret = self.puzzle.is_dead_end(state)
+        self.times["moves"] += time.perf_counter() - start
+        return ret
+
+    def __getattr__(self, name: str) -> Any:
+        """Use the wrapped puzzle for everything that is not timed."""
+        return getattr(self.puzzle, name)
+
+def current_memory() -> Optional[int]:
+    """Get the resident memory of this process in bytes if it is known."""
+    try:
+        import psutil
+    except ImportError:
+        psutil = None
+    if psutil is not None:
+        return psutil.Process().memory_info().rss
+    try:
+        import resource
+    except ImportError:
+        return None
+    # Without psutil fall back to the peak so far, in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+class MemorySampler(threading.Thread):
+    """Background thread recording the peak memory into `stats`."""
+    def __init__(self, stats: SearchStats, interval: float):
+        """Sample the memory every `interval` seconds."""
+        super().__init__(daemon=True)
+        self.stats = stats
+        self.interval = interval
+        self.__stopped = threading.Event()
+
+    def sample(self) -> None:
+        """Record the current memory if it is the highest so far."""
+        memory = current_memory()
+        if memory is not None and (
+            self.stats.peak_memory is None or memory > self.stats.peak_memory
+        ):
+            self.stats.peak_memory = memory
+
+    def run(self) -> None:
+        """Sample until stopped."""
+        self.sample()
+        while not self.__stopped.wait(self.interval):
+            self.sample()
+
+    def stop(self) -> None:
+        """Stop sampling after taking one last sample."""
+        self.__stopped.set()
+        self.join()
+        self.sample()
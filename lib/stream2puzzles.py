@@ -0,0 +1,186 @@
+"""Stream many puzzles from one file as compact packed encodings."""
+import json
+import re
+from typing import Any, Dict, Iterator, List, NamedTuple, Optional, TextIO, Tuple
+
+from lib.colour import Colour
+from lib.packed import PackedPuzzle
+
+class EncodedPuzzle(NamedTuple):
+    """A puzzle packed like a `PackedPuzzle` state, with the colour codes
+    of the `ColourTable` it was loaded with.
+    """
+    # Position of the puzzle in its file, counting from 0
+    index: int
+    num_bottles: int
+    capacity: int
+    state: bytes
+    # The puzzle as loaded if it could not be encoded, so whoever solves it
+    # reports why
+    raw: Any = None
+
+class ColourTable:
+    """Colour names interned as small ints, shared by every puzzle of a
+    stream. Codes start at 1, matching a `PackedPuzzle` of `names`.
+    """
+    def __init__(self, names: Tuple[str, ...] = ()):
+        """Create a table already holding `names`."""
+        self.names: List[str] = []
+        self.__codes: Dict[str, int] = {}
+        for name in names:
+            self.code(name)
+
+    def code(self, name: str) -> int:
+        """Get the code of the colour `name`, adding it if it is new."""
+        code = self.__codes.get(name)
+        if code is None:
+            if name not in Colour.__members__:
+                raise ValueError(f"'{name}' is not a valid Colour")
+            self.names.append(name)
+            code = self.__codes[name] = len(self.names)
+        return code
+
+    def codes(self) -> Dict[str, int]:
+        """Get the code of every colour interned so far by name."""
+        return self.__codes
+
+    def puzzle(
+        self, encoded: EncodedPuzzle, colour_symmetry: bool = False, prune: bool = False
+    ) -> Tuple[PackedPuzzle, bytes]:
+        """Get the `PackedPuzzle` of `encoded` and its packed state."""
+        puzzle = PackedPuzzle(
+            self.names, encoded.num_bottles, encoded.capacity, colour_symmetry, prune
+        )
+        return puzzle, encoded.state
+
+# Whitespace allowed between JSON values
+_WHITESPACE = re.compile(r"[ \t\n\r]*")
+
+# What follows a decoding error when the value was only cut short by the
+# end of the buffer: part of the last token, which holds no whitespace or
+# punctuation unless it is a string, and no string holds a newline
+_CUT_SHORT = re.compile(r'"[^\n]*|[^ \t\n\r,:\[\]{}"]*')
+
+class _Reader:
+    """Text of a file read a chunk at a time, from `pos` in `buffer`."""
+    def __init__(self, file: TextIO, chunk_size: int):
+        """Read `file` `chunk_size` characters at a time."""
+        self.file = file
+        self.chunk_size = chunk_size
+        self.buffer = ""
+        self.pos = 0
+
+    def fill(self) -> bool:
+        """Read another chunk, dropping what was read before `pos`.
+        False at the end of the file.
+        """
+        chunk = self.file.read(self.chunk_size)
+        if not chunk:
+            return False
+        self.buffer = self.buffer[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def peek(self, offset: int = 0) -> str:
+        """Skip whitespace from `pos` + `offset` and get the next character
+        without consuming it, or "" at the end of the file.
+        """
+        while True:
+            start = _WHITESPACE.match(self.buffer, self.pos + offset).end()
+            if start < len(self.buffer):
+                if offset == 0:
+                    self.pos = start
+                return self.buffer[start]
+            if not self.fill():
+                return ""
+
+    def opens_puzzles(self) -> bool:
+        """Check if the array at `pos` holds arrays of arrays, that is
+        puzzles rather than bottles.
+        """
+        if self.peek(1) != "[":
+            return False
+        # Skip to just after the first nested bracket
+        nested = _WHITESPACE.match(self.buffer, self.pos + 1).end() + 1
+        return self.peek(nested - self.pos) == "["
+
+def iter_values(file: TextIO, chunk_size: int = 1 << 16) -> Iterator[Any]:
+    """Yield the JSON values of `file` one at a time.
+
+    Values may be separated by newlines, other whitespace or nothing at
+    all. A top level array of puzzles, an array whose items are arrays of
+    arrays, is entered and its items yielded one by one, so the file is
+    read `chunk_size` characters at a time and never held whole.
+    """
+    decoder = json.JSONDecoder()
+    reader = _Reader(file, chunk_size)
+    # Whether the items of an outer array of puzzles are being read
+    outer = False
+    while True:
+        char = reader.peek()
+        if outer and char in (",", "]"):
+            outer = char == ","
+            reader.pos += 1
+            continue
+        if not char:
+            if outer:
+                raise ValueError("Unterminated array of puzzles")
+            return
+        if not outer and char == "[" and reader.opens_puzzles():
+            outer = True
+            reader.pos += 1
+            continue
+        try:
+            value, reader.pos = decoder.raw_decode(reader.buffer, reader.pos)
+        except json.JSONDecodeError as err:
+            # Read on only if more text could complete the value, so an
+            # invalid record is reported before the rest of the file is read
+            if _CUT_SHORT.fullmatch(reader.buffer, err.pos) and reader.fill():
+                continue
+            raise ValueError(f"Invalid JSON: {err.msg}") from None
+        yield value
+
+def load(
+    file: TextIO,
+    table: Optional[ColourTable] = None,
+    capacity: int = 4,
+    chunk_size: int = 1 << 16,
+) -> Iterator[EncodedPuzzle]:
+    """Lazily encode every puzzle of `file`, see `iter_values`.
+
+    Colours are coded with `table`, a new one if not given, so the loop
+    over the items is a dict lookup each. Puzzles that cannot be encoded,
+    as they are not lists of bottles, have a bottle holding more than
+    `capacity` items or an unknown colour, are yielded with an empty
+    state and their `raw` content for the solver to reject. Only invalid
+    JSON stops the stream, raising `ValueError`.
+    """
+    if table is None:
+        table = ColourTable()
+    codes = table.codes()
+    for index, content in enumerate(iter_values(file, chunk_size)):
+        state = _encode(content, capacity, table, codes)
+        if state is None:
+            yield EncodedPuzzle(index, 0, capacity, b"", content)
+        else:
+            yield EncodedPuzzle(index, len(content), capacity, state)
+
+def _encode(
+    content: Any, capacity: int, table: ColourTable, codes: Dict[str, int]
+) -> Optional[bytes]:
+    """Pack the puzzle `content`, or get None if it is not a valid one."""
+    if not isinstance(content, list):
+        return None
+    state = bytearray(len(content) * capacity)
+    for i, bottle in enumerate(content):
+        if not isinstance(bottle, list) or len(bottle) > capacity:
+            return None
+        start = i * capacity
+        for j, name in enumerate(bottle):
+            code = codes.get(name) if isinstance(name, str) else None
+            if code is None:
+                if not isinstance(name, str) or name not in Colour.__members__:
+                    return None
+                code = table.code(name)
+            state[start + j] = code
+    return bytes(state)
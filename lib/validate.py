@@ -0,0 +1,53 @@
+"""Checks rejecting puzzles that cannot be solved before searching them."""
+from collections import Counter
+from typing import List, Optional
+
+from lib.bottle import Bottle
+from lib.collection import BottleCollection
+
+class UnsolvableError(ValueError):
+    """Raised for a puzzle that cannot be solved, with the reason."""
+
+def check_data(data: List[List[str]], capacity: Optional[int] = None) -> None:
+    """Raise `UnsolvableError` if a bottle in the loaded `data` holds more
+    items than `capacity`, by default what a `Bottle` has room for, as
+    `Bottle` would drop the rest.
+    """
+    if capacity is None:
+        capacity = Bottle([]).capacity
+    for index, bottle in enumerate(data):
+        if len(bottle) > capacity:
+            raise UnsolvableError(
+                f"Bottle {index} holds {len(bottle)} items but its "
+                f"capacity is {capacity}"
+            )
+
+def check(collection: BottleCollection) -> None:
+    """Raise `UnsolvableError` if `collection` can be told unsolvable
+    without searching it: a bottle holds more than its capacity, the
+    bottles do not share a capacity, a colour cannot fill whole bottles or
+    no move can be made. Only the last check looks at pairs of bottles.
+    """
+    capacities = set()
+    counts: Counter = Counter()
+    for index, bottle in enumerate(collection.data):
+        if len(bottle.data) > bottle.capacity:
+            raise UnsolvableError(
+                f"Bottle {index} holds {len(bottle.data)} items but its "
+                f"capacity is {bottle.capacity}"
+            )
+        capacities.add(bottle.capacity)
+        counts.update(item.colour.name for item in bottle.data)
+    if len(capacities) > 1:
+        raise UnsolvableError(f"Bottles have different capacities: {sorted(capacities)}")
+    if not capacities:
+        return
+    capacity = capacities.pop()
+    for colour, count in counts.items():
+        if count % capacity:
+            raise UnsolvableError(
+                f"{colour} has {count} items, which cannot fill bottles "
+                f"of {capacity}"
+            )
+    if not collection.is_solved and not collection.get_moves():
+        raise UnsolvableError("No move can be made")
@@ -1,41 +1,184 @@
 """Entry point for the solver"""
 from typing import Optional
-import click
+import argparse
 
-import os
 from lib import file2collection
 from lib.collection import BottleCollection
-from lib.search import A_star, State, dfs
+from lib.heuristic import HEURISTICS
+from lib.optimize import optimize
+from lib.search import (
+    State, A_star, anytime_A_star, batched_beam_search, beam_search,
+    bidirectional, dfs, ida_star, weighted_A_star,
+)
+from lib.stats import SearchStats, current_memory
+from lib.validate import UnsolvableError
 import time
-import psutil
 
-def main():
+def portfolio(root: BottleCollection, **options) -> Optional[State]:
+    """Run `lib.portfolio.portfolio`, importing multiprocessing only
+    when it is chosen.
+    """
+    from lib.portfolio import portfolio
+    return portfolio(root, **options)
+
+# Algorithms that can be chosen: (description, solver, uses a heuristic)
+ALGORITHMS = {
+    "DFS": ("Depth-First Search", dfs, False),
+    "A*": ("A* Search", A_star, True),
+    "WA*": ("Weighted A* Search", weighted_A_star, True),
+    "AWA*": ("Anytime Weighted A* Search", anytime_A_star, True),
+    "IDA*": ("Iterative Deepening A* Search", ida_star, True),
+    "BEAM": ("Beam Search", beam_search, True),
+    "BBEAM": ("Batched Beam Search", batched_beam_search, False),
+    "BIDI": ("Bidirectional Search", bidirectional, False),
+    "PORTFOLIO": ("Portfolio", portfolio, False),
+}
+
+def parse_args() -> argparse.Namespace:
+    """Parse the command line, anything not given is asked for later."""
+    parser = argparse.ArgumentParser(description="Solve a water sort puzzle.")
+    parser.add_argument("puzzle", nargs="?", help="path to a .json puzzle")
+    parser.add_argument("--algorithm", choices=list(ALGORITHMS))
+    parser.add_argument(
+        "--heuristic",
+        choices=sorted(HEURISTICS),
+        default="bottom_colours",
+        help="heuristic used by the A* variants and beam search "
+        "(default: %(default)s)",
+    )
+    parser.add_argument(
+        "--weight",
+        type=float,
+        default=2,
+        help="heuristic weight of WA* and AWA* (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--width",
+        type=int,
+        default=100,
+        help="states kept per depth by BEAM and BBEAM (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--prune",
+        action="store_true",
+        help="skip dominated moves and try the best moves first",
+    )
+    parser.add_argument(
+        "--memory-budget",
+        type=float,
+        metavar="MB",
+        help="memory A* and WA* keep states in before spilling them to "
+        "temporary files",
+    )
+    parser.add_argument(
+        "--deadline",
+        type=float,
+        help="seconds PORTFOLIO waits for its solvers and AWA* improves its "
+        "solution for",
+    )
+    parser.add_argument(
+        "--shortest",
+        action="store_true",
+        help="make PORTFOLIO wait for the shortest solution found before "
+        "the deadline instead of the first one",
+    )
+    parser.add_argument(
+        "--shorten",
+        action="store_true",
+        help="cut repeated states and join nearby states with fewer moves "
+        "in the solution found",
+    )
+    parser.add_argument(
+        "--cache",
+        metavar="FILE",
+        help="SQLite file of solutions to reuse and add to",
+    )
+    parser.add_argument(
+        "--stats",
+        action="store_true",
+        help="time each phase of the search and print what it did",
+    )
+    return parser.parse_args()
+
+def print_progress(stats: SearchStats) -> None:
+    """Report how far a search has got."""
+    print(
+        "... %.1fs: %d states expanded, frontier of up to %d, depth %d"
+        % (stats.elapsed, stats.nodes_expanded, stats.max_frontier, stats.max_depth)
+    )
 
-    puzzle: str = input("Path to puzzle, please provide a .json file only, for example 'levels/LV1.json' : ")
+def print_solution(result: State) -> None:
+    """Report a solution shorter than the ones found before."""
+    print("... found a solution in", len(result.moves), "moves")
+
+def main():
+    args = parse_args()
+    puzzle: str = args.puzzle or input("Path to puzzle, please provide a .json file only, for example 'levels/LV1.json' : ")
     try:
         start: BottleCollection = file2collection.load(puzzle)
+    except UnsolvableError as err:
+        print("Cannot be solved:", err)
+        return None
     except ValueError as err:
+        import click
         raise click.BadArgumentUsage("Invalid PUZZLE: " + str(err))
     print("Here is the input: \n")
     print(start, "\n")
 
-    algorithm: str = input ("Algorithm, please type DFS or A*: ")
     result: Optional[State] = None
-    if algorithm == "A*":
-        start_time = time.time()
-        process = psutil.Process(os.getpid())
-        print("Searching using A* Search\n")
-        result = A_star(start)
-        print("Time execution in A* Algorithm is %s second" % (time.time() - start_time))
-        print("Memory used:", process.memory_info().rss / (1024 * 1024), "MB")
+    cache = None
+    if args.cache is not None:
+        from lib.cache import SolutionCache
+        cache = SolutionCache(args.cache)
+        result = cache.get(start)
+        if result is not None:
+            print("Found in the cache", args.cache, "\n")
+            args.algorithm = "cached"
 
-    elif algorithm == "DFS":
+    algorithm: str = args.algorithm or input ("Algorithm, please type " + ", ".join(ALGORITHMS) + ": ")
+    if algorithm in ALGORITHMS:
+        name, solver, uses_heuristic = ALGORITHMS[algorithm]
+        options = {}
+        using = name
+        if uses_heuristic:
+            options["heuristic"] = args.heuristic
+            using += " with the " + args.heuristic + " heuristic"
+        if algorithm in ("DFS", "A*", "WA*", "AWA*", "IDA*", "BEAM"):
+            options["prune"] = args.prune
+        if algorithm in ("A*", "WA*"):
+            options["memory_budget"] = args.memory_budget
+        if algorithm == "WA*":
+            options["weight"] = args.weight
+        elif algorithm == "AWA*":
+            options["weight"] = args.weight
+            options["time_limit"] = args.deadline
+            options["on_solution"] = print_solution
+        elif algorithm in ("BEAM", "BBEAM"):
+            options["width"] = args.width
+        elif algorithm == "PORTFOLIO":
+            options["deadline"] = args.deadline
+            options["shortest"] = args.shortest
+        stats = SearchStats()
+        if args.stats:
+            stats = SearchStats(
+                timing=True, progress=print_progress, memory_interval=0.1
+            )
         start_time = time.time()
-        process = psutil.Process(os.getpid())
-        print("Searching using Depth-First Search\n")
-        result = dfs(start)
-        print("Time execution in Depth-First Search Algorithm is %s second" % (time.time() - start_time))
-        print("Memory used:", process.memory_info().rss / (1024 * 1024), "MB")
+        print("Searching using", using, "\n")
+        result = solver(start, stats=stats, **options)
+        print("Time execution in %s Algorithm is %s second" % (name, time.time() - start_time))
+        memory = current_memory()
+        if memory is not None:
+            print("Memory used:", memory / (1024 * 1024), "MB")
+        if args.shorten and result is not None:
+            found = len(result.moves)
+            result = optimize(start, result)
+            print("Shortened the solution from", found, "to", len(result.moves), "moves")
+        if args.stats:
+            for counter, value in stats.as_dict().items():
+                print(" ", counter.replace("_", " ") + ":", value)
+        if cache is not None and result is not None:
+            cache.put(start, result, algorithm, stats)
 
     if result is None:
         print("Cannot be solved :(")
@@ -45,4 +188,4 @@ def main():
     return None
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,47 @@
+"""Serve solve requests as lines of JSON on a Unix or TCP socket.
+
+The solver stays loaded in a pool of worker processes between requests,
+so each one only pays for its search. See `lib/server.py` for the format
+of the requests and replies.
+"""
+import argparse
+import asyncio
+import os
+import sys
+
+from lib.search import SOLVERS
+from lib.server import SolveServer
+
+def parse_args() -> argparse.Namespace:
+    """Parse the command line."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    where = parser.add_mutually_exclusive_group()
+    where.add_argument("--unix", metavar="PATH", help="listen on a Unix socket at PATH")
+    where.add_argument("--port", type=int, default=8765, help="TCP port to listen on (default: %(default)s)")
+    parser.add_argument("--host", default="127.0.0.1", help="TCP host to listen on (default: %(default)s)")
+    parser.add_argument("--jobs", "-j", type=int, default=None, help="worker processes (default: available CPUs)")
+    parser.add_argument("--queue", type=int, default=64, help="requests that may wait for a worker (default: %(default)s)")
+    parser.add_argument("--deadline", type=float, default=None, help="seconds allowed to requests that do not set one")
+    parser.add_argument("--algorithm", choices=sorted(SOLVERS), default="A_star", help="solver used by requests that do not set one (default: %(default)s)")
+    return parser.parse_args()
+
+def main() -> int:
+    args = parse_args()
+    server = SolveServer(args.jobs, args.queue, args.deadline, args.algorithm)
+    try:
+        if args.unix is not None:
+            if os.path.exists(args.unix):
+                os.remove(args.unix)
+            print(f"Serving on {args.unix} with {server.jobs} workers", file=sys.stderr)
+            asyncio.run(server.serve_unix(args.unix))
+        else:
+            print(f"Serving on {args.host}:{args.port} with {server.jobs} workers", file=sys.stderr)
+            asyncio.run(server.serve_tcp(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,28 @@
+"""Tests of the NumPy batched solvers."""
+from pathlib import Path
+
+import pytest
+
+from lib import json2collection
+from lib.search import beam_search
+from lib.stats import SearchStats
+
+batched = pytest.importorskip("lib.batched")
+pytest.importorskip("numpy")
+
+LEVELS = Path(__file__).parent.parent / "levels"
+
+@pytest.mark.parametrize("width", [1, 10, 100])
+@pytest.mark.parametrize("level", ["LV5", "LV12", "LV19", "LV22", "LV711"])
+def test_batched_beam_search_matches_beam_search(level, width):
+    with open(LEVELS / f"{level}.json") as file:
+        root = json2collection.load(file)
+    stats = SearchStats()
+    expected = beam_search(root, width, stats=stats)
+    batched_stats = SearchStats()
+    result = batched.batched_beam_search(root, width, stats=batched_stats)
+    if expected is None:
+        assert result is None
+        return
+    assert result.moves == expected.moves
+    assert batched_stats.dead_ends == stats.dead_ends
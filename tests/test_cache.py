@@ -0,0 +1,56 @@
+"""Tests of the persistent solution cache."""
+import random
+from pathlib import Path
+
+from lib import json2collection
+from lib.cache import SolutionCache
+from lib.collection import BottleCollection
+from lib.stats import SearchStats
+
+LEVELS = Path(__file__).parent.parent / "levels"
+
+def _shuffled(content, seed):
+    """Get `content` with its bottles shuffled and its colours swapped."""
+    rng = random.Random(seed)
+    names = sorted({name for bottle in content for name in bottle})
+    swapped = dict(zip(names, rng.sample(names, len(names))))
+    bottles = [[swapped[name] for name in bottle] for bottle in content]
+    rng.shuffle(bottles)
+    return bottles
+
+def _replay(root, moves):
+    """Get `root` after making `moves`."""
+    for move in moves:
+        root = root.after_moving(move)
+    return root
+
+def test_shuffled_and_recoloured_puzzle_hits_the_cache(tmp_path):
+    with open(LEVELS / "LV5.json") as file:
+        root = json2collection.load(file)
+    content = [[item.colour.name for item in bottle.data] for bottle in root.data]
+    cache = SolutionCache(str(tmp_path / "solutions.sqlite3"))
+    try:
+        result = cache.solve(root, "A_star")
+        assert len(cache) == 1
+        for seed in range(5):
+            other = BottleCollection(_shuffled(content, seed))
+            stats = SearchStats()
+            hit = cache.solve(other, "A_star", stats=stats)
+            # Served from the cache without searching
+            assert stats.nodes_expanded == 0
+            assert len(hit.moves) == len(result.moves)
+            assert _replay(other, hit.moves).is_solved
+        assert len(cache) == 1
+    finally:
+        cache.close()
+
+def test_wrong_entry_is_dropped(tmp_path):
+    root = BottleCollection([["RED", "BLUE", "RED", "BLUE"], ["BLUE", "RED", "BLUE", "RED"], [], []])
+    cache = SolutionCache(str(tmp_path / "solutions.sqlite3"))
+    try:
+        result = cache.solve(root, "A_star")
+        cache.put(root, type(result)(result.collection, result.moves[:1]))
+        assert cache.get(root) is None
+        assert len(cache) == 0
+    finally:
+        cache.close()
@@ -0,0 +1,74 @@
+"""Tests of the canonical state keys."""
+import itertools
+import random
+from pathlib import Path
+
+from lib import json2collection
+from lib.canonical import canonical_key, canonical_order
+from lib.packed import PackedPuzzle
+
+LEVELS = Path(__file__).parent.parent / "levels"
+
+def _random_states(level, count, seed=0):
+    """Get `count` states reached by random walks from `level`."""
+    with open(LEVELS / f"{level}.json") as file:
+        puzzle, start = PackedPuzzle.from_collection(json2collection.load(file))
+    rng = random.Random(seed)
+    states = []
+    while len(states) < count:
+        state = start
+        for _ in range(rng.randrange(1, 15)):
+            moves = puzzle.get_moves(state)
+            if not moves:
+                break
+            state = puzzle.after_moving(state, *rng.choice(moves))
+        states.append(state)
+    return puzzle, states
+
+def _recoloured(bottles, colours):
+    """Get `bottles` with colour i + 1 swapped for `colours[i]`."""
+    table = bytes.maketrans(bytes(range(1, len(colours) + 1)), bytes(colours))
+    return [bottle.translate(table) for bottle in bottles]
+
+def test_order_builds_the_key():
+    puzzle, states = _random_states("LV12", 50)
+    for state in states:
+        bottles = puzzle.bottles(state)
+        for symmetry in (False, True):
+            key, order = canonical_order(bottles, symmetry)
+            assert key == canonical_key(bottles, symmetry)
+            assert sorted(order) == list(range(len(bottles)))
+        assert b"".join(bottles[i] for i in canonical_order(bottles)[1]) == canonical_key(bottles)
+
+def test_symmetric_key_only_joins_recoloured_states():
+    puzzle, states = _random_states("LV5", 300)
+    rng = random.Random(0)
+    colours = range(1, len(puzzle.colours) + 1)
+    groups = {}
+    for state in states:
+        bottles = puzzle.bottles(state)
+        # Add a recoloured copy so most keys are shared by several states
+        for copy in (bottles, _recoloured(bottles, rng.sample(colours, len(colours)))):
+            groups.setdefault(canonical_key(copy, True), []).append(copy)
+    for group in groups.values():
+        first = group[0]
+        # Every state sharing a key is `first` with its colours swapped
+        orbit = {
+            canonical_key(_recoloured(first, permutation))
+            for permutation in itertools.permutations(colours)
+        }
+        for bottles in group[1:]:
+            assert canonical_key(bottles) in orbit
+
+def test_recoloured_state_usually_shares_the_key():
+    puzzle, states = _random_states("LV5", 100, seed=1)
+    rng = random.Random(1)
+    colours = list(range(1, len(puzzle.colours) + 1))
+    shared = 0
+    for state in states:
+        bottles = puzzle.bottles(state)
+        permutation = rng.sample(colours, len(colours))
+        other = _recoloured(bottles, permutation)
+        rng.shuffle(other)
+        shared += canonical_key(other, True) == canonical_key(bottles, True)
+    assert shared >= 90
@@ -0,0 +1,54 @@
+"""Tests of the solution post-optimizer."""
+from pathlib import Path
+
+import pytest
+
+from lib import json2collection
+from lib.collection import BottleCollection
+from lib.move import Move
+from lib.optimize import optimize, shorten
+from lib.search import dfs
+
+LEVELS = Path(__file__).parent.parent / "levels"
+
+def _load(level):
+    """Load the puzzle of `level`."""
+    with open(LEVELS / f"{level}.json") as file:
+        return json2collection.load(file)
+
+def _replay(root, moves):
+    """Get `root` after making `moves`."""
+    for move in moves:
+        root = root.after_moving(move)
+    return root
+
+@pytest.mark.parametrize("level", ["LV5", "LV12", "LV19", "LV22"])
+def test_optimized_solution_solves_and_is_no_longer(level):
+    root = _load(level)
+    result = dfs(root)
+    shorter = optimize(root, result)
+    assert len(shorter.moves) <= len(result.moves)
+    assert _replay(root, shorter.moves).is_solved
+    assert shorter.collection.is_solved
+
+SMALL = BottleCollection([
+    ["RED", "RED", "RED"],
+    ["BLUE", "BLUE", "BLUE", "RED"],
+    ["BLUE"],
+    [],
+    ["GREEN", "GREEN"],
+    ["GREEN", "GREEN"],
+])
+
+def test_cycle_is_cut():
+    moves = (Move(0, 3), Move(3, 0), Move(1, 0), Move(1, 2), Move(4, 5))
+    shorter = shorten(SMALL, moves)
+    assert shorter == moves[2:]
+
+def test_later_moves_are_renumbered():
+    # Pouring bottle 0 into the empty bottle 3 only swaps the two bottles,
+    # so joining the first two moves into one renumbers the moves after
+    moves = (Move(0, 3), Move(4, 5), Move(1, 3), Move(1, 2))
+    shorter = shorten(SMALL, moves)
+    assert len(shorter) == 3
+    assert _replay(SMALL, shorter).is_solved
@@ -0,0 +1,22 @@
+"""Tests of the packed solvers."""
+from pathlib import Path
+
+import pytest
+
+from lib import json2collection
+from lib.search import A_star, ida_star
+
+LEVELS = Path(__file__).parent.parent / "levels"
+
+@pytest.mark.parametrize("prune", [False, True])
+@pytest.mark.parametrize("level", ["LV5", "LV19", "LV22", "LV711", "LV727"])
+def test_ida_star_finds_the_fewest_moves(level, prune):
+    with open(LEVELS / f"{level}.json") as file:
+        root = json2collection.load(file)
+    expected = A_star(root, prune=prune)
+    result = ida_star(root, prune=prune)
+    assert len(result.moves) == len(expected.moves)
+    collection = root
+    for move in result.moves:
+        collection = collection.after_moving(move)
+    assert collection.is_solved
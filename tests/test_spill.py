@@ -0,0 +1,46 @@
+"""Tests of the disk-spilling frontier and the A* searches using it."""
+import heapq
+import random
+from pathlib import Path
+
+import pytest
+
+from lib import json2collection
+from lib.search import A_star, weighted_A_star
+from lib.spill import SpillingHeap
+from lib.stats import SearchStats
+
+LEVELS = Path(__file__).parent.parent / "levels"
+
+def test_spilling_heap_pops_in_order(tmp_path):
+    rng = random.Random(0)
+    heap = SpillingHeap(4, budget=2000, directory=str(tmp_path))
+    reference: list = []
+    for counter in range(500):
+        entry = (
+            float(rng.randrange(50)), -rng.randrange(20), counter,
+            bytes(rng.randrange(256) for _ in range(4)), counter,
+        )
+        heap.push(entry)
+        heapq.heappush(reference, entry)
+        # Interleave pops with pushes so runs are merged with newer entries
+        if counter % 3 == 0:
+            assert heap.pop() == heapq.heappop(reference)
+    assert heap.spilled > 0
+    assert len(heap) == len(reference)
+    while reference:
+        assert heap.pop() == heapq.heappop(reference)
+    heap.close()
+
+@pytest.mark.parametrize("solver", [A_star, weighted_A_star])
+@pytest.mark.parametrize("level", ["LV5", "LV12", "LV19"])
+def test_memory_budget_does_not_change_the_search(solver, level):
+    with open(LEVELS / f"{level}.json") as file:
+        root = json2collection.load(file)
+    plain_stats = SearchStats()
+    plain = solver(root, stats=plain_stats)
+    spilled_stats = SearchStats()
+    spilled = solver(root, stats=spilled_stats, memory_budget=0.01)
+    assert spilled_stats.spilled > 0
+    assert len(spilled.moves) == len(plain.moves)
+    assert spilled_stats.nodes_expanded == plain_stats.nodes_expanded
@@ -0,0 +1,24 @@
+"""Tests of the search counters and phase timers."""
+from pathlib import Path
+
+import pytest
+
+from lib import json2collection
+from lib.search import SOLVERS
+from lib.stats import PHASES, SearchStats
+
+LEVELS = Path(__file__).parent.parent / "levels"
+
+@pytest.mark.parametrize(
+    "algorithm", ["A_star", "weighted_A_star", "ida_star", "beam_search"]
+)
+def test_every_phase_is_timed_with_the_default_heuristic(algorithm):
+    with open(LEVELS / "LV12.json") as file:
+        root = json2collection.load(file)
+    stats = SearchStats(timing=True)
+    assert SOLVERS[algorithm](root, stats=stats) is not None
+    for phase in PHASES:
+        assert stats.phase_times[phase] > 0, phase
+    # Every child is scored, so scoring takes a share of the time like
+    # applying the moves does rather than just the root's
+    assert stats.phase_times["heuristic"] > stats.phase_times["apply"] / 4
@@ -0,0 +1,67 @@
+"""Tests of the streaming puzzle loader."""
+import io
+import json
+
+import pytest
+
+from lib.packed import PackedPuzzle
+from lib.collection import BottleCollection
+from lib.stream2puzzles import ColourTable, iter_values, load
+
+PUZZLES = [
+    [["RED", "BLUE", "RED", "BLUE"], ["BLUE", "RED", "BLUE", "RED"], []],
+    [["GREEN", "GREEN"], ["GREEN", "GREEN", "PINK", "PINK"], ["PINK", "PINK"]],
+    [[], ["ORANGE", "ORANGE", "ORANGE", "ORANGE"]],
+]
+
+TEXTS = {
+    "lines": "\n".join(json.dumps(puzzle) for puzzle in PUZZLES) + "\n",
+    "array": json.dumps(PUZZLES, indent=2),
+    "packed": "".join(json.dumps(puzzle, separators=(",", ":")) for puzzle in PUZZLES),
+    "spaced": " \r\n\t".join(json.dumps(puzzle) for puzzle in PUZZLES),
+}
+
+@pytest.mark.parametrize("chunk_size", range(1, 8))
+@pytest.mark.parametrize("layout", sorted(TEXTS))
+def test_iter_values_matches_json(layout, chunk_size):
+    values = list(iter_values(io.StringIO(TEXTS[layout]), chunk_size))
+    assert values == PUZZLES
+
+@pytest.mark.parametrize("chunk_size", range(1, 8))
+def test_load_encodes_like_packed_puzzle(chunk_size):
+    table = ColourTable()
+    encoded = list(load(io.StringIO(TEXTS["lines"]), table, 4, chunk_size))
+    assert [puzzle.index for puzzle in encoded] == [0, 1, 2]
+    for puzzle, content in zip(encoded, PUZZLES):
+        packed, state = table.puzzle(puzzle)
+        expected, expected_state = PackedPuzzle.from_collection(BottleCollection(content))
+        assert packed.unpack(state).data == expected.unpack(expected_state).data
+
+def test_invalid_puzzles_are_reported_per_record():
+    text = '[["RED"]]\n"not a puzzle"\n[["RED", "RED", "RED", "RED", "RED"]]\n[["NOPE"]]\n[["BLUE"]]\n'
+    encoded = list(load(io.StringIO(text), chunk_size=3))
+    assert [puzzle.index for puzzle in encoded] == [0, 1, 2, 3, 4]
+    assert [puzzle.raw is None for puzzle in encoded] == [True, False, False, False, True]
+    assert encoded[1].raw == "not a puzzle"
+
+def test_invalid_json_raises_after_the_valid_values():
+    values = iter_values(io.StringIO('[["RED"]]\n[["BLUE"]'), 4)
+    assert next(values) == [["RED"]]
+    with pytest.raises(ValueError):
+        next(values)
+
+@pytest.mark.parametrize("bad", ['[["RED",, "BLUE"]]', '[["RED" "BLUE"]]', '[["RED", tru]]'])
+def test_invalid_json_raises_before_reading_the_rest(bad):
+    rest = "".join(json.dumps(puzzle) + "\n" for puzzle in PUZZLES * 1000)
+    file = io.StringIO(json.dumps(PUZZLES[0]) + "\n" + bad + "\n" + rest)
+    values = iter_values(file, 64)
+    assert next(values) == PUZZLES[0]
+    with pytest.raises(ValueError):
+        next(values)
+    assert file.tell() < len(rest)
+
+@pytest.mark.parametrize("chunk_size", range(1, 8))
+def test_values_cut_by_chunks_are_completed(chunk_size):
+    values = [[["RED", "BLUE"]], [1.5e3, -2], ["a\u00e9\"b"], [True, False, None]]
+    text = "\n".join(json.dumps(value) for value in values)
+    assert list(iter_values(io.StringIO(text), chunk_size)) == values